@@ -0,0 +1,149 @@
+"""
+Animated attachments (GIF, animated WebP, MP4) decoded lazily.
+
+The asset cache keeps only the downloaded bytes and the per-frame durations. A source decodes a
+frame the first time the output timeline samples it, resizes it once and keeps it in a byte-bounded
+LRU, so memory stays bounded however long or large the attachment is.
+"""
+from collections import OrderedDict
+from io import BytesIO
+from moviepy import VideoClip
+from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader, ffmpeg_parse_infos
+from PIL import Image
+import numpy as np
+import os, tempfile
+import metrics
+
+
+MAX_FRAME_CACHE_BYTES = 64 * 1024**2  # resized frames kept per source, ~33 frames at 800x800
+MIN_FRAME_DELAY_MS = 20  # browsers play smaller GIF delays at 100ms
+DEFAULT_FRAME_DELAY_MS = 100
+
+
+def sniff(data: bytes) -> str:
+    """gif, webp (decoded with PIL) or video (anything else, decoded with ffmpeg)."""
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "video"
+
+
+def spill(data: bytes) -> str:
+    """ffmpeg reads from a path, so video bytes are written to a temporary file the caller removes."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as tmp:
+        tmp.write(data)
+    return tmp.name
+
+
+def frame_durations(data: bytes) -> np.ndarray:
+    """Seconds each source frame is shown, read without keeping any frame."""
+    if sniff(data) == "video":
+        path = spill(data)
+        try:
+            infos = ffmpeg_parse_infos(path)
+        finally:
+            os.remove(path)
+        return np.full(max(int(infos["video_n_frames"]), 1), 1.0 / infos["video_fps"])
+
+    durations = []
+    with Image.open(BytesIO(data)) as image:
+        for index in range(getattr(image, "n_frames", 1)):
+            image.seek(index)
+            delay = image.info.get("duration") or 0
+            durations.append((delay if delay >= MIN_FRAME_DELAY_MS else DEFAULT_FRAME_DELAY_MS) / 1000)
+    return np.array(durations)
+
+
+def fit_size(width: int, height: int, box: int) -> tuple:
+    """Largest size with the source's aspect ratio that fits in a box x box square."""
+    scale = box / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def scene_duration(source_duration: float, max_duration: float, overflow: str = "trim") -> float:
+    """trim plays the source once, cut at max_duration; loop repeats it to fill exactly max_duration."""
+    if overflow == "loop":
+        return max_duration
+    return min(source_duration, max_duration)
+
+
+class AnimatedSource:
+    """
+    Frames of one animated attachment, resized to fit a size x size box.
+    Only frames the output timeline samples are resized; GIF/WebP frames in between are still
+    composited by PIL (later frames draw on earlier ones) but never converted or resized, and
+    MP4 frames in between are skipped in ffmpeg's output.
+    """
+
+    def __init__(self, data: bytes, durations: np.ndarray, size: int, max_cache_bytes: int = MAX_FRAME_CACHE_BYTES):
+        self.kind = sniff(data)
+        self.durations = durations
+        self.ends = np.cumsum(durations)
+        self.duration = float(self.ends[-1])
+        self.max_cache_bytes = max_cache_bytes
+        self._frames = OrderedDict()
+        self._frames_bytes = 0
+        self._image = self._reader = self._path = None
+        if self.kind == "video":
+            self._path = spill(data)
+            self.size = fit_size(*ffmpeg_parse_infos(self._path)["video_size"], size)
+            self._reader = FFMPEG_VideoReader(self._path, target_resolution=self.size)
+        else:
+            self._image = Image.open(BytesIO(data))
+            self.size = fit_size(*self._image.size, size)
+
+    def index_at(self, t: float) -> int:
+        """Source frame shown t seconds in, looping past the end."""
+        return min(int(np.searchsorted(self.ends, t % self.duration, side="right")), len(self.durations) - 1)
+
+    def frame(self, index: int) -> np.ndarray:
+        if index in self._frames:
+            self._frames.move_to_end(index)
+            metrics.tracer.count("animated.frame_cache_hit")
+            return self._frames[index]
+
+        frame = self._decode(index)
+        metrics.tracer.count("animated.frames_decoded")
+        self._frames[index] = frame
+        self._frames_bytes += frame.nbytes
+        while len(self._frames) > 1 and self._frames_bytes > self.max_cache_bytes:
+            _, evicted = self._frames.popitem(last=False)
+            self._frames_bytes -= evicted.nbytes
+        return frame
+
+    def _decode(self, index: int) -> np.ndarray:
+        if self._reader is not None:
+            return self._reader.get_frame(self.ends[index] - self.durations[index])
+        self._image.seek(index)
+        frame = np.asarray(self._image.convert("RGB").resize(self.size, Image.Resampling.LANCZOS))
+        frame.flags.writeable = False
+        return frame
+
+    def frame_at(self, t: float) -> np.ndarray:
+        return self.frame(self.index_at(t))
+
+    def close(self):
+        self._frames.clear()
+        self._frames_bytes = 0
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+        if self._path is not None:
+            os.remove(self._path)
+            self._path = None
+
+
+class AnimatedClip(VideoClip):
+    """VideoClip over an AnimatedSource, sampled on the clip's timeline; closing it closes the source."""
+
+    def __init__(self, source: AnimatedSource, duration: float):
+        self.source = source
+        super().__init__(frame_function=source.frame_at, duration=duration)
+
+    def close(self):
+        self.source.close()
+        super().close()
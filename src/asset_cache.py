@@ -0,0 +1,323 @@
+from io import BytesIO
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlsplit
+from PIL import Image, ImageDraw, ImageOps
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
+import hashlib, json, os, re, threading, time, atexit, requests
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: index flushes are not serialized across processes
+    fcntl = None
+
+
+CACHE_DIR = "./cache/assets"
+MAX_CACHE_BYTES = 2 * 1024**3  # 2GB on disk
+MAX_MEMORY_ENTRIES = 256
+MAX_MEMORY_BYTES = 256 * 1024**2  # decoded payloads kept in-process
+REVALIDATE_AFTER = 7 * 24 * 60 * 60  # seconds before an entry is revalidated with the origin
+HTTP_TIMEOUT = (5, 30)  # (connect, read) seconds
+HTTP_RETRIES = 3
+MAX_REQUESTS_PER_HOST = 6
+
+
+def make_session(pool_size: int = 32, retries: int = HTTP_RETRIES) -> requests.Session:
+    """Pooled HTTP session that retries connection errors and 429/5xx with backoff."""
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def payload_bytes(payload: dict) -> int:
+    return sum(array.nbytes for array in payload.values())
+
+
+class AssetCache:
+    """
+    Content-addressed on-disk cache of processed assets.
+    Entries are keyed by (transform, url) and hold the processed NumPy arrays, so a hit skips
+    both the download and the PIL work. Animated attachments are kept as their raw bytes and decoded
+    lazily by animated_source. Stale entries are revalidated with ETag/Last-Modified, and served as they
+    are when the origin can't be reached.
+    Several processes may share one root: flush() merges with the index on disk under a file lock.
+    """
+
+    def __init__(
+        self,
+        root: str = CACHE_DIR,
+        max_bytes: int = MAX_CACHE_BYTES,
+        revalidate_after: float = REVALIDATE_AFTER,
+        timeout=HTTP_TIMEOUT,
+        max_per_host: int = MAX_REQUESTS_PER_HOST,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.timeout = timeout
+        self.session = make_session()
+        self._host_limits = defaultdict(lambda: threading.BoundedSemaphore(max_per_host))
+        self.index_path = os.path.join(root, "index.json")
+        self.lock_path = os.path.join(root, "index.lock")
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._dirty = False
+        self._removed = set()  # keys this process evicted since the last flush
+        os.makedirs(root, exist_ok=True)
+        self.index: dict = self._read_index()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(url: str, transform: str) -> str:
+        return hashlib.sha256(f"{transform}\n{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.npz")
+
+    def get(self, url: str, headers: dict = None, timings: dict = None) -> requests.Response:
+        """GET through the pooled session, limited per host. Network time and bytes go into timings."""
+        start = time.perf_counter()
+        with self._host_limits[urlsplit(url).netloc]:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        metrics.tracer.count("bytes_downloaded", len(response.content))
+        if timings is not None:
+            timings["network"] = timings.get("network", 0.0) + time.perf_counter() - start
+            timings["bytes"] = timings.get("bytes", 0) + len(response.content)
+        return response
+
+    def fetch(self, url: str, transform: str, process, timings: dict = None) -> dict:
+        """
+        Return the processed payload (dict of arrays) for url under transform.
+        `process` receives the downloaded bytes and returns the payload on a miss.
+        If timings is given, it is filled with the source of the payload and network/decode seconds.
+        """
+        timings = {} if timings is None else timings
+        key = self.make_key(url, transform)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touch(key)
+                timings["source"] = "memory"
+                metrics.tracer.count("asset_cache.hit.memory")
+                return self._memory[key]
+            entry = self.index.get(key)
+
+        cached = self._load(key) if entry is not None else None
+        if cached is not None:
+            headers = {}
+            if time.time() - entry["fetched_at"] < self.revalidate_after:
+                timings["source"] = "disk"
+                metrics.tracer.count("asset_cache.hit.disk")
+                return self._remember(key, cached)
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            try:
+                response = self.get(url, headers=headers, timings=timings)
+            except requests.RequestException:
+                response = None
+            if response is not None and response.status_code == 304:
+                with self._lock:
+                    entry["fetched_at"] = time.time()
+                    self._dirty = True
+                timings["source"] = "revalidated"
+                metrics.tracer.count("asset_cache.hit.revalidated")
+                return self._remember(key, cached)
+            if response is None or response.status_code != 200:
+                # origin unreachable or failing (e.g. offline): a stale payload beats a blank one
+                timings["source"] = "stale"
+                metrics.tracer.count("asset_cache.hit.stale")
+                return self._remember(key, cached)
+        else:
+            response = self.get(url, timings=timings)
+
+        response.raise_for_status()
+        timings["source"] = "network"
+        metrics.tracer.count("asset_cache.miss")
+        start = time.perf_counter()
+        network_before = timings.get("network", 0.0)
+        payload = process(response.content)
+        # process may download more (tenor pages); that time is already counted as network
+        timings["decode"] = time.perf_counter() - start - (timings.get("network", 0.0) - network_before)
+        self._store(key, url, transform, response, payload)
+        return self._remember(key, payload)
+
+    def _load(self, key: str) -> dict:
+        """Payload on disk, or None if it is gone (e.g. evicted by another process sharing the root)."""
+        try:
+            with np.load(self._path(key)) as data:
+                payload = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._touch(key)
+        return payload
+
+    def _remember(self, key: str, payload: dict) -> dict:
+        with self._lock:
+            if key not in self._memory:
+                self._memory[key] = payload
+                self._memory_bytes += payload_bytes(payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > 1 and (len(self._memory) > MAX_MEMORY_ENTRIES or self._memory_bytes > MAX_MEMORY_BYTES):
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= payload_bytes(evicted)
+        return payload
+
+    def _touch(self, key: str):
+        entry = self.index.get(key)
+        if entry is not None:
+            entry["accessed_at"] = time.time()
+            self._dirty = True
+
+    def _store(self, key: str, url: str, transform: str, response, payload: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **payload)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self.index[key] = {
+                "url": url,
+                "transform": transform,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": os.path.getsize(path),
+                "fetched_at": now,
+                "accessed_at": now,
+            }
+            self._removed.discard(key)
+            self._dirty = True
+        self.flush()
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _merge(self, disk: dict):
+        """Fold the index other processes flushed into ours: their new entries, newer fetches and accesses."""
+        for key, theirs in disk.items():
+            if key in self._removed:
+                continue
+            mine = self.index.get(key)
+            if mine is None:
+                self.index[key] = theirs
+                continue
+            accessed_at = max(mine["accessed_at"], theirs["accessed_at"])
+            if theirs["fetched_at"] > mine["fetched_at"]:
+                mine.update(theirs)
+            mine["accessed_at"] = accessed_at
+        # entries only we know of whose file is gone were evicted elsewhere
+        for key in [key for key in self.index if key not in disk and not os.path.isfile(self._path(key))]:
+            del self.index[key]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = sum(entry["size"] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            del self.index[key]
+            self._removed.add(key)
+            evicted = self._memory.pop(key, None)
+            if evicted is not None:
+                self._memory_bytes -= payload_bytes(evicted)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def flush(self):
+        """Merge the index with the one on disk, evict down to max_bytes and persist it, if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._merge(self._read_index())
+                self._evict()
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.index, f)
+                os.replace(tmp_path, self.index_path)
+                # closing lock_file releases the flock
+            self._removed.clear()
+            self._dirty = False
+
+
+default_cache = AssetCache()
+
+
+# --- Asset transforms ---
+def circle_avatar(data: bytes, size: int) -> dict:
+    """Mask an image to a circle of the given size."""
+    avatar_img = Image.open(BytesIO(data)).convert("RGBA")
+    avatar_img = ImageOps.fit(avatar_img, (size, size), Image.Resampling.LANCZOS)
+
+    mask = Image.new("L", (size, size), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, size, size), fill=255)
+
+    avatar_img.putalpha(mask)
+    return {"image": np.array(avatar_img)}
+
+
+def thumbnail(data: bytes, size: int) -> dict:
+    """Shrink an image to fit in a size x size box."""
+    attachment_img = Image.open(BytesIO(data)).convert("RGBA")
+    attachment_img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return {"image": np.array(attachment_img)}
+
+
+def animated(data: bytes, url: str, get=requests.get) -> dict:
+    """Raw bytes and frame durations of a gif/webp/mp4 (or of the gif a tenor view page points to)."""
+    from animated_source import frame_durations
+
+    # If tenor view link, extract raw gif
+    if url.startswith("https://tenor.com"):
+        matches = re.findall(r'https://media1\.tenor\.com/[^\s"\']+\.gif', data.decode("utf-8", errors="ignore"))
+        if not matches:
+            raise Exception("GIF URL not found")
+        response = get(matches[0])
+        response.raise_for_status()
+        data = response.content
+
+    return {"data": np.frombuffer(data, dtype=np.uint8), "durations": frame_durations(data)}
+
+
+def load_avatar(url: str, size: int, cache: AssetCache = None, timings: dict = None) -> np.ndarray:
+    cache = cache or default_cache
+    return cache.fetch(url, f"circle:{size}", lambda data: circle_avatar(data, size), timings)["image"]
+
+
+def load_attachment_image(url: str, size: int, cache: AssetCache = None, timings: dict = None) -> np.ndarray:
+    cache = cache or default_cache
+    return cache.fetch(url, f"thumbnail:{size}", lambda data: thumbnail(data, size), timings)["image"]
+
+
+def load_animated(url: str, cache: AssetCache = None, timings: dict = None) -> dict:
+    """Cached bytes and frame durations of an animated attachment; size-independent, so one entry serves every size."""
+    cache = cache or default_cache
+    get = lambda gif_url: cache.get(gif_url, timings=timings)
+    return cache.fetch(url, "animated", lambda data: animated(data, url, get), timings)
+
+
+def load_attachment_gif(url: str, size: int, cache: AssetCache = None, timings: dict = None):
+    """Lazily decoded animated_source.AnimatedSource fitted to a size x size box; close it when done."""
+    from animated_source import AnimatedSource
+
+    payload = load_animated(url, cache, timings)
+    return AnimatedSource(payload["data"].tobytes(), payload["durations"], size)
@@ -0,0 +1,234 @@
+from collections import deque
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+
+
+MAX_ATTEMPTS = 3
+POLL_INTERVAL = 2.0  # seconds between spool directory scans
+
+
+def job_config(job: dict, defaults: dict) -> dict:
+    """Job spec on top of the .env config; accepts channel_id or channel_ids."""
+    config = {**defaults, **{k: v for k, v in job.items() if k not in ("id", "attempt")}}
+    if "channel_id" in job:
+        config["channel_ids"] = [job["channel_id"]]
+    # explicit either way, so a channel job never inherits load_from_scenario_file from .env
+    config["load_from_file"] = bool(job.get("scenario_src"))
+    # a batch worker is one of many processes, so each render stays single-process and memory-bounded;
+    # workers are daemonic and can't start render_parallel's pool anyway
+    config["render_mode"] = job.get("render_mode", "stream")
+    if config["render_mode"] == "parallel":
+        print(f"⚠️ {job.get('id', 'job')}: render_mode=parallel is not available in batch workers, rendering with stream")
+        config["render_mode"] = "stream"
+    return config
+
+
+def warm_up(fonts: list):
+    """Load what every render needs once per worker: fonts and the sound index/bank."""
+    import main as cli  # noqa: F401  (moviepy, openai and every pipeline module)
+    import scenario_rules
+    import shorts
+    import sound_bank
+    import text_render
+
+    for font in fonts:
+        if os.path.isfile(font):
+            for size in (shorts.TITLE_FONT_SIZE, shorts.MESSAGE_FONT_SIZE, shorts.USERNAME_FONT_SIZE, shorts.WATERMARK_FONT_SIZE):
+                text_render.load_font(font, size)
+    scenario_rules.sound_index()
+    if os.path.isfile(shorts.DEFAULT_SOUND_PATH):
+        sound_bank.default_bank.load(shorts.DEFAULT_SOUND_PATH)
+
+
+def run_job(job: dict, defaults: dict) -> dict:
+    """Render every scenario of one job and return its status record with timings."""
+    import main as cli
+
+    record = {"id": job["id"], "attempt": job["attempt"], "status": "ok", "outputs": [], "timings": {}}
+    started = time.perf_counter()
+    try:
+        config = job_config(job, defaults)
+        scenarios = cli.build_scenarios(config)
+        record["timings"]["scenario"] = time.perf_counter() - started
+        render_started = time.perf_counter()
+        for filename, scenario in scenarios:
+            record["outputs"].append(cli.render_scenario(config, filename, scenario))
+        record["timings"]["render"] = time.perf_counter() - render_started
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = f"{e}\n{traceback.format_exc()}"
+    record["timings"]["total"] = time.perf_counter() - started
+    return record
+
+
+def worker_main(worker_id: int, jobs: mp.Queue, events: mp.Queue, defaults: dict, logger=None):
+    """
+    Warm worker: loads shared state once, then renders jobs until it receives None.
+    Each record also gets the job's stage timings and the worker's peak RSS. logger(worker_id, job_id, events),
+    if given, makes the proglog logger of each job (see service.ProgressLogger).
+    """
+    import metrics
+
+    warm_up([defaults["title_font"], defaults["message_font"], defaults["watermark_font"]])
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        # a fresh tracer per job, so a long-lived worker doesn't accumulate spans
+        metrics.tracer = metrics.Tracer()
+        if logger is not None:
+            metrics.tracer.logger = logger(worker_id, job["id"], events)
+        record = run_job(job, defaults)
+        record["stages"] = metrics.tracer.stage_totals()
+        record["peak_rss_mb"] = metrics.peak_rss_mb()
+        events.put((worker_id, record))
+
+
+class BatchRunner:
+    """
+    Runs jobs on `workers` long-lived processes with bounded parallelism.
+    A worker that dies mid-job is replaced and only its job is re-queued; other jobs keep running.
+    """
+
+    target = staticmethod(worker_main)  # what each worker process runs; see service.py
+
+    def __init__(self, workers: int, results_path: str, defaults: dict):
+        self.ctx = mp.get_context("spawn")
+        self.events = self.ctx.Queue()
+        self.results_path = results_path
+        self.defaults = defaults
+        self.workers = {}  # worker_id -> (process, its own job queue)
+        self.running = {}  # worker_id -> job, assigned here so a crash always knows which job was lost
+        self.backlog = deque()
+        self.outstanding = 0
+        self.next_id = 0
+        for worker_id in range(workers):
+            self._spawn(worker_id)
+
+    def _spawn(self, worker_id: int):
+        jobs = self.ctx.Queue()
+        process = self.ctx.Process(target=self.target, args=(worker_id, jobs, self.events, self.defaults), daemon=True)
+        process.start()
+        self.workers[worker_id] = (process, jobs)
+
+    def submit(self, job: dict):
+        job = {**job, "id": job.get("id") or f"job-{self.next_id}", "attempt": job.get("attempt", 1)}
+        self.next_id += 1
+        self.outstanding += 1
+        self.backlog.append(job)
+        self._dispatch()
+
+    def _dispatch(self):
+        for worker_id, (process, jobs) in self.workers.items():
+            if not self.backlog:
+                return
+            if worker_id not in self.running and process.is_alive():
+                job = self.backlog.popleft()
+                self.running[worker_id] = job
+                jobs.put(job)
+
+    def _record(self, record: dict):
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"{'✅' if record['status'] == 'ok' else '❌'} {record['id']} (attempt {record['attempt']}): {record['status']} in {record['timings'].get('total', 0):.1f}s")
+
+    def _finish(self, job: dict, record: dict):
+        self.outstanding -= 1
+        if record["status"] != "ok" and job["attempt"] < MAX_ATTEMPTS:
+            self._record(record)
+            self.submit({**job, "attempt": job["attempt"] + 1})
+            return
+        self._record(record)
+
+    def _event(self, worker_id: int, record: dict):
+        self._finish(self.running.pop(worker_id), record)
+
+    def poll(self, timeout: float = 1.0):
+        """Handle worker events and replace dead workers."""
+        try:
+            worker_id, record = self.events.get(timeout=timeout)
+            self._event(worker_id, record)
+        except queue.Empty:
+            pass
+
+        for worker_id, (process, _) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            job = self.running.pop(worker_id, None)
+            self._spawn(worker_id)
+            if job is not None:
+                self._finish(job, {"id": job["id"], "attempt": job["attempt"], "status": "crashed", "outputs": [], "timings": {}, "error": f"worker exited with code {process.exitcode}"})
+        self._dispatch()
+
+    def drain(self):
+        while self.outstanding > 0:
+            self.poll()
+
+    def close(self):
+        for _, jobs in self.workers.values():
+            jobs.put(None)
+        for process, _ in self.workers.values():
+            process.join(timeout=30)
+
+
+def read_manifest(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        jobs = [json.loads(line) for line in f if line.strip()]
+    if not all(isinstance(job, dict) for job in jobs):
+        raise ValueError(f"{path}: every line must be a JSON object")
+    return jobs
+
+
+def watch_spool(runner: BatchRunner, spool_dir: str):
+    """
+    Queue every *.jsonl manifest dropped into spool_dir; picked-up files are renamed to *.queued,
+    and ones that can't be read or parsed to *.failed, without stopping the watch.
+    """
+    while True:
+        for path in sorted(glob.glob(os.path.join(spool_dir, "*.jsonl"))):
+            queued_path = f"{path}.queued"
+            try:
+                os.replace(path, queued_path)
+                manifest = read_manifest(queued_path)
+            except (OSError, ValueError) as e:
+                print(f"❌ {os.path.basename(path)}: {e}")
+                if os.path.exists(queued_path):
+                    os.replace(queued_path, f"{path}.failed")
+                continue
+            for job in manifest:
+                runner.submit(job)
+        runner.poll(timeout=POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many shorts from a manifest or a spool directory.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="JSONL of jobs: channel_id/channel_ids, after, before, filename, fonts or scenario_src")
+    source.add_argument("--spool", help="directory watched for *.jsonl manifests")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--results", default="./output/batch_results.jsonl")
+    args = parser.parse_args()
+
+    import main as cli
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    runner = BatchRunner(args.workers, args.results, cli.load_config())
+    try:
+        if args.manifest:
+            for job in read_manifest(args.manifest):
+                runner.submit(job)
+            runner.drain()
+        else:
+            watch_spool(runner, args.spool)
+    finally:
+        runner.close()
+
+
+if __name__ == "__main__":
+    main()
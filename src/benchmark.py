@@ -0,0 +1,280 @@
+"""
+Reproducible benchmarks: synthetic chats rendered offline against the local stand-in (standin.py),
+compared with stored baselines.
+
+  render  synthetic scenario -> video (asset fetch, scene build, compose, audio, encode)
+  e2e     stand-in Discord -> stand-in OpenRouter -> video, i.e. what main.py does
+
+Every case runs in a fresh process with empty asset/LLM/message caches, so peak RSS and cache
+misses belong to that case alone. Baselines are machine-specific: record them on the machine that
+runs the comparison.
+
+  python src/benchmark.py --save-baseline            # record the current numbers
+  python src/benchmark.py                            # compare; exits 1 on a regression
+  python src/benchmark.py --messages 300 --gif-share 0.3 --pipeline render
+  python src/benchmark.py --pipeline render --profile preview upload target   # encode time vs size
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse, datetime as dt, json, multiprocessing as mp, os, random, shutil, statistics, sys, tempfile, time
+import encoder
+
+
+BASELINE_PATH = "./bench/baselines.json"
+CASES = {
+    "small": {"messages": 20, "text_length": 30, "image_share": 0.1, "gif_share": 0.05, "chatters": 4},
+    "medium": {"messages": 80, "text_length": 40, "image_share": 0.15, "gif_share": 0.1, "chatters": 8},
+    "text_heavy": {"messages": 80, "text_length": 120, "image_share": 0.0, "gif_share": 0.0, "chatters": 12},
+}
+# allowed relative change before a metric counts as a regression
+TOLERANCES = {"fps": 0.10, "latency": 0.15, "peak_rss_mb": 0.10, "encoded_bytes": 0.05}
+HIGHER_IS_BETTER = {"fps"}
+
+BASE_TIME = dt.datetime(2025, 8, 18, 12, 0, tzinfo=dt.timezone.utc)
+SECONDS_BETWEEN_MESSAGES = 23
+TIMEZONE = dt.timezone(dt.timedelta(hours=9))  # KST, as main.py
+WORDS = [
+    "ㅋㅋㅋㅋ", "헐", "진짜?", "오늘", "점심", "뭐", "먹지", "방귀", "안녕", "굿", "ㄴㄴ", "ㅠㅠ", "게임", "하자",
+    "lol", "lmao", "what", "wait", "bro", "this", "is", "fine", "gg", "no", "way", "😂", "🔥",
+]
+
+
+def synthetic_text(rng: random.Random, length: int) -> str:
+    """Chat-like text of roughly length characters (±50%)."""
+    target = max(1, int(length * rng.uniform(0.5, 1.5)))
+    words = []
+    while sum(len(word) + 1 for word in words) < target:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def synthetic_messages(spec: dict, base_url: str, seed: int = 0) -> list:
+    """
+    Raw Discord API messages (oldest first) for a case spec: messages, text_length, image_share,
+    gif_share and chatters, and optionally attachment_pool, the number of distinct attachment urls
+    (default: one per message). Attachments point at the stand-in; avatars go through DISCORD_CDN.
+    """
+    from scrap_discord import datetime_to_snowflake
+
+    rng = random.Random(seed)
+    authors = [
+        {"id": str(100000 + i), "username": f"user{i}", "global_name": f"채터{i}", "avatar": f"{i:032x}"}
+        for i in range(spec["chatters"])
+    ]
+    messages = []
+    for i in range(spec["messages"]):
+        timestamp = BASE_TIME + dt.timedelta(seconds=i * SECONDS_BETWEEN_MESSAGES)
+        roll = rng.random()
+        asset = i % spec.get("attachment_pool", spec["messages"])
+        attachments = []
+        if roll < spec["gif_share"]:
+            attachments.append({"url": f"{base_url}/gifs/{asset}.gif", "content_type": "image/gif"})
+        elif roll < spec["gif_share"] + spec["image_share"]:
+            attachments.append({"url": f"{base_url}/images/{asset}.png", "content_type": "image/png"})
+        messages.append({
+            "id": str(datetime_to_snowflake(timestamp) + i),
+            "author": rng.choice(authors),
+            "content": "" if attachments and rng.random() < 0.5 else synthetic_text(rng, spec["text_length"]),
+            "timestamp": timestamp.isoformat(),
+            "attachments": attachments,
+        })
+    return messages
+
+
+def run_case(name: str, pipeline: str, mode: str, profile: str, messages: list, fonts: dict, duration: float = None) -> dict:
+    """
+    One measured run, meant for a fresh spawned process.
+    With duration, every message scene lasts that long instead of scenario_rules' length (gifs keep theirs),
+    so many scenes render in few frames.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="dc2s-bench-")
+    import asset_cache
+    import generate_scenario
+    import message_store
+    import metrics
+    import scenario_rules
+    import scrap_discord
+    import shorts
+    import standin
+    import stream_render
+
+    asset_cache.default_cache = asset_cache.AssetCache(root=os.path.join(tmp_dir, "assets"))
+    generate_scenario.CACHE_DIR = os.path.join(tmp_dir, "llm")
+    message_store.STORE_DIR = os.path.join(tmp_dir, "store")
+    renderers = {"stream": stream_render.render_streaming, "moviepy": shorts.generate_discord_chat_shorts}
+    filename = f"bench_{name}_{pipeline}_{profile}_{os.getpid()}"
+    output_path = os.path.join("./output", f"{filename}.mp4")
+
+    try:
+        started = time.perf_counter()
+        if pipeline == "e2e":
+            after = dt.datetime.fromisoformat(messages[0]["timestamp"]) - dt.timedelta(minutes=1)
+            before = dt.datetime.fromisoformat(messages[-1]["timestamp"]) + dt.timedelta(minutes=1)
+            chat = scrap_discord.extract_chat("standin", channel_id(name), filename=filename, timezone=TIMEZONE, before=before, after=after)
+            scenario = generate_scenario.generate_scenario(content=chat, save=False, filename=filename)
+        else:
+            chat = scrap_discord.build_chat_data(scrap_discord.message_to_content(msg, TIMEZONE) for msg in messages)
+            scenario = scenario_rules.apply_rules(standin.scenario_from_window(chat.get_data()))
+        if duration is not None:
+            for msg in scenario["contents"]:
+                msg["duration"] = duration
+        render_started = time.perf_counter()
+        renderers[mode](scenario=scenario, filename=filename, profile=profile, **fonts)
+        finished = time.perf_counter()
+        if not os.path.isfile(output_path):
+            raise RuntimeError(f"{name}/{pipeline}: render produced no {output_path}")
+
+        frames = metrics.tracer.counters["frames_encoded"]
+        return {
+            "case": name,
+            "pipeline": pipeline,
+            "mode": mode,
+            "profile": profile,
+            "messages": len(scenario["contents"]),
+            "frames": frames,
+            "fps": frames / (finished - render_started),
+            "latency": finished - started,
+            "peak_rss_mb": metrics.peak_rss_mb(),
+            "encoded_bytes": os.path.getsize(output_path),
+            "stages": metrics.tracer.stage_totals(),
+            "counters": dict(metrics.tracer.counters),
+        }
+    finally:
+        if os.path.isfile(output_path):
+            os.remove(output_path)
+        # persist the index now; an atexit flush would find its directory gone
+        asset_cache.default_cache.flush()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def channel_id(name: str) -> str:
+    return f"bench-{name}"
+
+
+def summarize(runs: list) -> dict:
+    """Median fps/latency/bytes and the worst peak RSS over repeated runs."""
+    result = dict(runs[-1])
+    for metric in ("fps", "latency", "encoded_bytes"):
+        result[metric] = statistics.median(run[metric] for run in runs)
+    result["peak_rss_mb"] = max(run["peak_rss_mb"] for run in runs)
+    result["runs"] = len(runs)
+    return result
+
+
+def result_key(result: dict) -> str:
+    return f"{result['case']}/{result['pipeline']}/{result['mode']}/{result['profile']}"
+
+
+def run_suite(cases: dict, pipelines: list, mode: str, profiles: list, repeat: int, latency: float = 0.0) -> list:
+    """Start the stand-in, then run every (case, pipeline, profile) `repeat` times, each in its own process."""
+    import standin
+
+    with standin.StandIn(latency=latency) as server:
+        # spawned children inherit this, so their scrap_discord/generate_scenario talk to the stand-in
+        os.environ.update(server.env())
+        import main as cli
+
+        config = cli.load_config()
+        fonts = {key: config[key] for key in ("title_font", "message_font", "watermark_font")}
+        cases_messages = {name: synthetic_messages(spec, server.url) for name, spec in cases.items()}
+        server.channels.update({channel_id(name): sorted(messages, key=lambda msg: -int(msg["id"])) for name, messages in cases_messages.items()})
+
+        results = []
+        for name, messages in cases_messages.items():
+            for pipeline in pipelines:
+                for profile in profiles:
+                    runs = []
+                    for _ in range(repeat):
+                        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+                            runs.append(pool.submit(run_case, name, pipeline, mode, profile, messages, fonts, cases[name].get("duration")).result())
+                    results.append(summarize(runs))
+        return results
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(results: list, path: str):
+    baselines = load_baselines(path)
+    baselines.update({result_key(result): result for result in results})
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, ensure_ascii=False, indent=2)
+
+
+def compare(result: dict, baseline: dict, tolerances: dict = TOLERANCES) -> list:
+    """Regressions of result against its baseline, as printable strings."""
+    regressions = []
+    for metric, tolerance in tolerances.items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if metric in HIGHER_IS_BETTER else change) > tolerance:
+            regressions.append(f"{result_key(result)} {metric}: {old:.2f} -> {new:.2f} ({change:+.1%}, tolerance {tolerance:.0%})")
+    return regressions
+
+
+def print_results(results: list, baselines: dict):
+    print(f"{'case':<36} {'fps':>7} {'latency':>9} {'encode':>8} {'peak MB':>8} {'bytes':>11}  vs baseline")
+    for result in results:
+        baseline = baselines.get(result_key(result))
+        delta = f"fps {result['fps'] / baseline['fps'] - 1:+.1%}, latency {result['latency'] / baseline['latency'] - 1:+.1%}" if baseline else "-"
+        print(
+            f"{result_key(result):<36} {result['fps']:7.1f} {result['latency']:8.2f}s {result['stages'].get('encode', 0.0):7.2f}s "
+            f"{result['peak_rss_mb']:8.0f} {result['encoded_bytes']:11d}  {delta}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rendering and the full pipeline against offline stand-ins.")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=["small", "medium"])
+    parser.add_argument("--messages", type=int, help="run a custom case instead, with this many messages")
+    parser.add_argument("--text-length", type=int, default=40)
+    parser.add_argument("--image-share", type=float, default=0.15)
+    parser.add_argument("--gif-share", type=float, default=0.1)
+    parser.add_argument("--chatters", type=int, default=8)
+    parser.add_argument("--pipeline", nargs="+", choices=["render", "e2e"], default=["render", "e2e"])
+    parser.add_argument("--mode", choices=["stream", "moviepy"], default="stream")
+    parser.add_argument("--profile", nargs="+", choices=sorted(encoder.PROFILES), default=[encoder.DEFAULT_PROFILE])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stand-in request")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, help="one relative tolerance for every metric")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.messages:
+        cases = {"custom": {
+            "messages": args.messages, "text_length": args.text_length, "image_share": args.image_share,
+            "gif_share": args.gif_share, "chatters": args.chatters,
+        }}
+    else:
+        cases = {name: CASES[name] for name in args.cases}
+
+    results = run_suite(cases, args.pipeline, args.mode, args.profile, args.repeat, args.latency)
+    baselines = load_baselines(args.baseline)
+    print_results(results, baselines)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        save_baselines(results, args.baseline)
+        print(f"✅ Baselines saved to {args.baseline}")
+        return
+
+    tolerances = {metric: args.tolerance for metric in TOLERANCES} if args.tolerance is not None else TOLERANCES
+    regressions = [line for result in results if result_key(result) in baselines for line in compare(result, baselines[result_key(result)], tolerances)]
+    for line in regressions:
+        print(f"\u001b[31mRegression: {line}\u001b[0m")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Columnar chat export.
+
+ChatRawData keeps messages column-wise instead of as a list of dicts:
+  - names, avatars, timestamp labels and attachment types are interned once per export
+  - author, epoch time, timestamp label and attachment offsets are compact `array` columns
+  - message texts and attachment urls are plain lists
+  - bot and Discord-generated messages are marked in a byte column and carry "system": true
+Messages are appended oldest first, so a time window is two bisections of the time column and
+window() returns a view sharing the columns. Serialization (NDJSON, LLM windows, get_data) walks
+the view chunk by chunk, so memory and time scale with the window used, not with the export.
+"""
+from array import array
+from bisect import bisect_left
+import datetime as dt
+import json
+import os
+import threading
+import utils
+
+
+NDJSON_CHUNK = 1000  # messages per write
+UNKNOWN_TIME = -1  # messages ingested from a dict only carry their formatted timestamp
+
+
+def epoch_ms(time: dt.datetime) -> int:
+    return int(time.timestamp() * 1000)
+
+
+class Interner:
+    """Each distinct value stored once; messages refer to it by index."""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def add(self, value) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+class Columns:
+    """Storage shared by an export and every window of it."""
+
+    def __init__(self):
+        self.names = Interner()
+        self.avatars = {}  # name index -> latest avatar url
+        self.labels = Interner()
+        self.types = Interner()
+        self.author = array("l")
+        self.time = array("q")
+        self.label = array("l")
+        self.system = array("b")
+        self.text = []
+        self.attachment_start = array("l", [0])
+        self.attachment_url = []
+        self.attachment_type = array("l")
+
+
+class ChatRawData:
+    """
+    Chat messages (oldest first) and their chatters.
+    `chatters`, `contents` and get_data() still give the {"chatters", "contents"} dicts the
+    pipeline used before; iter_messages(), window() and chunks() avoid building them.
+    """
+
+    def __init__(self, rawdata: dict = None):
+        self._columns = Columns()
+        self._start, self._stop = 0, None  # stop None: the whole export, including later appends
+        if rawdata is None:
+            return
+        try:
+            chatters = rawdata["chatters"]
+            for msg in rawdata["contents"]:
+                avatar = chatters.get(msg["name"], {}).get("avatar")
+                self.append(msg["name"], avatar, msg["content"], None, msg.get("attachments", []), msg.get("timestamp", ""), msg.get("system", False))
+        except Exception as err:
+            print(f"Error initializing ChatRawData: {err}")
+            self._columns = Columns()
+
+    def _view(self, start: int, stop: int) -> "ChatRawData":
+        view = ChatRawData()
+        view._columns, view._start, view._stop = self._columns, start, stop
+        return view
+
+    def _bounds(self) -> tuple:
+        return self._start, len(self._columns.text) if self._stop is None else self._stop
+
+    def __len__(self) -> int:
+        start, stop = self._bounds()
+        return stop - start
+
+    def append(self, name: str, avatar: str, content: str, time: dt.datetime, attachments: list, timestamp: str = None, system: bool = False):
+        """
+        Add the newest message; time is its aware datetime, formatted like utils.format_datetime unless timestamp is given.
+        system marks bot and Discord-generated messages.
+        """
+        columns = self._columns
+        author = columns.names.add(name)
+        columns.avatars[author] = avatar
+        columns.author.append(author)
+        columns.time.append(UNKNOWN_TIME if time is None else epoch_ms(time))
+        columns.label.append(columns.labels.add(timestamp if timestamp is not None else utils.format_datetime(time)))
+        columns.system.append(bool(system))
+        columns.text.append(content)
+        for attachment in attachments:
+            columns.attachment_url.append(attachment["url"])
+            columns.attachment_type.append(columns.types.add(attachment["content_type"]))
+        columns.attachment_start.append(len(columns.attachment_url))
+
+    def message(self, i: int) -> dict:
+        """The i-th message of the export as {"name", "content", "timestamp", "attachments"}, plus "system": True if set."""
+        columns = self._columns
+        attachments = [
+            {"url": columns.attachment_url[j], "content_type": columns.types.values[columns.attachment_type[j]]}
+            for j in range(columns.attachment_start[i], columns.attachment_start[i + 1])
+        ]
+        message = {
+            "name": columns.names.values[columns.author[i]],
+            "content": columns.text[i],
+            "timestamp": columns.labels.values[columns.label[i]],
+            "attachments": attachments,
+        }
+        # only when set, so windows (and their LLM cache keys) of ordinary messages stay as they were
+        if columns.system[i]:
+            message["system"] = True
+        return message
+
+    def iter_messages(self):
+        start, stop = self._bounds()
+        for i in range(start, stop):
+            yield self.message(i)
+
+    def chatter(self, name: str) -> dict:
+        author = self._columns.names.index[name]
+        return {"name": name, "avatar": self._columns.avatars[author]}
+
+    @property
+    def chatters(self) -> dict:
+        """Chatters appearing in this window, in order of first message."""
+        start, stop = self._bounds()
+        authors = dict.fromkeys(self._columns.author[start:stop])
+        return {self._columns.names.values[author]: self.chatter(self._columns.names.values[author]) for author in authors}
+
+    @property
+    def contents(self) -> list:
+        return list(self.iter_messages())
+
+    def get_data(self):
+        return {"chatters": self.chatters, "contents": self.contents}
+
+    def window(self, after: dt.datetime = None, before: dt.datetime = None) -> "ChatRawData":
+        """View of the messages with after <= time < before, found by bisection."""
+        start, stop = self._bounds()
+        lo = start if after is None else bisect_left(self._columns.time, epoch_ms(after), start, stop)
+        hi = stop if before is None else bisect_left(self._columns.time, epoch_ms(before), lo, stop)
+        return self._view(lo, hi)
+
+    def chunks(self, size: int = NDJSON_CHUNK):
+        """Consecutive views of at most size messages."""
+        start, stop = self._bounds()
+        for lo in range(start, stop, size):
+            yield self._view(lo, min(lo + size, stop))
+
+    def write_ndjson(self, path: str, chunk_size: int = NDJSON_CHUNK):
+        """One message per line with its avatar and epoch time, written a chunk at a time."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        columns = self._columns
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for chunk in self.chunks(chunk_size):
+                start, stop = chunk._bounds()
+                lines = []
+                for i in range(start, stop):
+                    record = self.message(i)
+                    record["avatar"] = columns.avatars[columns.author[i]]
+                    record["time"] = columns.time[i]
+                    lines.append(json.dumps(record, ensure_ascii=False))
+                f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read_ndjson(cls, path: str, after: dt.datetime = None, before: dt.datetime = None) -> "ChatRawData":
+        """Load an NDJSON export line by line, keeping only messages with after <= time < before."""
+        lo = None if after is None else epoch_ms(after)
+        hi = None if before is None else epoch_ms(before)
+        chat = cls()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                time = record.get("time", UNKNOWN_TIME)
+                if (lo is not None and time < lo) or (hi is not None and time >= hi):
+                    continue
+                chat.append(record["name"], record.get("avatar"), record["content"], None, record["attachments"], record["timestamp"], record.get("system", False))
+                chat._columns.time[-1] = time
+        return chat
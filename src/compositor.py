@@ -0,0 +1,155 @@
+from bisect import bisect_right
+from moviepy import CompositeVideoClip, ColorClip
+import numpy as np
+import time
+import metrics
+
+
+class Scene:
+    """
+    One message of the chat sequence.
+    `static_clips` never change during the scene and are rasterized once; `dynamic` is an optional
+    (clip, x, y) whose frames (gif attachments) are blitted on top of the static layer every frame.
+    """
+
+    def __init__(self, duration: float, static_clips: list, dynamic: tuple = None):
+        self.duration = duration
+        self.static_clips = static_clips
+        self.dynamic = dynamic
+
+    def rasterize(self, size: tuple, bg_color: tuple, overlays: list) -> np.ndarray:
+        """Render background, static message clips and overlays into one RGB frame."""
+        background = ColorClip(size=size, color=bg_color).with_duration(1)
+        overlay_clips = [clip.with_position((x, y)) for clip, x, y in overlays]
+        layers = [clip.with_duration(1) for clip in self.static_clips + overlay_clips]
+        return np.ascontiguousarray(CompositeVideoClip([background] + layers, size=size).get_frame(0)[:, :, :3], dtype=np.uint8)
+
+    def close(self):
+        for clip in self.static_clips:
+            clip.close()
+        if self.dynamic is not None:
+            self.dynamic[0].close()
+
+
+def clip_region(x: int, y: int, w: int, h: int, size: tuple):
+    """Intersect a w x h region at (x, y) with the frame; returns frame and source slices or None."""
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, size[0]), min(y + h, size[1])
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (slice(y0, y1), slice(x0, x1)), (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+
+def blend_into(dst: np.ndarray, src: np.ndarray, alpha: np.ndarray):
+    """
+    Alpha-blend src (h, w, 3) onto opaque dst in place.
+    Uses the integer arithmetic of PIL's Image.alpha_composite, which moviepy composes with,
+    so blended pixels match the CompositeVideoClip path exactly.
+    """
+    a = alpha.astype(np.uint32)[:, :, None]
+    tmp = (src.astype(np.uint32) * a + dst.astype(np.uint32) * (255 - a)) * 128 + (0x80 << 7)
+    dst[...] = ((((tmp >> 8) + tmp) >> 8) >> 7).astype(np.uint8)
+
+
+def blit(dst: np.ndarray, frame: np.ndarray, alpha, x: int, y: int):
+    """Paste (alpha is None) or alpha-blend frame onto dst at (x, y), clipped to dst."""
+    region = clip_region(x, y, frame.shape[1], frame.shape[0], (dst.shape[1], dst.shape[0]))
+    if region is None:
+        return
+    (dy, dx), (sy, sx) = region
+    if alpha is None:
+        dst[dy, dx] = frame[sy, sx, :3]
+    else:
+        blend_into(dst[dy, dx], frame[sy, sx, :3], alpha[sy, sx])
+
+
+def clip_alpha(clip, t: float = 0):
+    """uint8 alpha of a clip at t the way moviepy converts masks, or None for opaque clips."""
+    if clip.mask is None:
+        return None
+    return (clip.mask.get_frame(t) * 255).astype("uint8")
+
+
+class FrameCompositor:
+    """
+    Renders the whole chat sequence into a preallocated RGB buffer.
+    Only the active scene's static layer is kept; per frame only the dynamic region is redrawn,
+    followed by whichever overlay pixels sit on top of it.
+    """
+
+    def __init__(self, scenes: list, size: tuple, bg_color: tuple, overlays: list = None):
+        """`scenes` may be empty when scenes are built lazily and passed to render()."""
+        self.scenes = scenes
+        self.size = size
+        self.bg_color = bg_color
+        self.overlays = overlays or []
+        self.starts = []
+        total = 0.0
+        for scene in scenes:
+            self.starts.append(total)
+            total += scene.duration
+        self.duration = total
+        self._overlay_layers = [(clip.get_frame(0), clip_alpha(clip), x, y) for clip, x, y in self.overlays]
+        self._buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self._active_index = None
+        self._active_layer = None
+        self._buffer_index = None
+
+    def scene_at(self, t: float) -> int:
+        return min(max(bisect_right(self.starts, t) - 1, 0), len(self.scenes) - 1)
+
+    def static_layer(self, index: int, scene: Scene) -> np.ndarray:
+        if index != self._active_index:
+            self._active_layer = scene.rasterize(self.size, self.bg_color, self.overlays)
+            self._active_index = index
+        return self._active_layer
+
+    def release(self):
+        """Drop the active scene's layer, e.g. once a streamed scene has been emitted."""
+        self._active_index = self._active_layer = self._buffer_index = None
+
+    def frame(self, t: float) -> np.ndarray:
+        index = self.scene_at(t)
+        return self.render(index, self.scenes[index], t - self.starts[index])
+
+    @metrics.profiled
+    def render(self, index: int, scene: Scene, local_t: float) -> np.ndarray:
+        """Frame of scene (the index-th of the sequence) at local_t seconds into it."""
+        started = time.perf_counter()
+        frame = self._render(index, scene, local_t)
+        metrics.tracer.add_frame(index, time.perf_counter() - started)
+        return frame
+
+    def _render(self, index: int, scene: Scene, local_t: float) -> np.ndarray:
+        layer = self.static_layer(index, scene)
+        if scene.dynamic is None:
+            return layer
+
+        if self._buffer_index != index:
+            np.copyto(self._buffer, layer)
+            self._buffer_index = index
+        clip, x, y = scene.dynamic
+        frame = clip.get_frame(local_t)
+        region = clip_region(x, y, frame.shape[1], frame.shape[0], self.size)
+        if region is None:
+            return layer
+        (dy, dx), _ = region
+        alpha = clip_alpha(clip, local_t)
+        if alpha is not None:
+            self._buffer[dy, dx] = layer[dy, dx]
+        blit(self._buffer, frame, alpha, x, y)
+
+        # Re-apply the overlay pixels that sit on top of the dynamic region
+        for overlay, overlay_alpha, ox, oy in self._overlay_layers:
+            overlay_region = clip_region(ox, oy, overlay.shape[1], overlay.shape[0], self.size)
+            if overlay_region is None:
+                continue
+            (ody, odx), _ = overlay_region
+            y0, y1 = max(dy.start, ody.start), min(dy.stop, ody.stop)
+            x0, x1 = max(dx.start, odx.start), min(dx.stop, odx.stop)
+            if y0 >= y1 or x0 >= x1:
+                continue
+            src = overlay[y0 - oy : y1 - oy, x0 - ox : x1 - ox]
+            src_alpha = None if overlay_alpha is None else overlay_alpha[y0 - oy : y1 - oy, x0 - ox : x1 - ox]
+            blit(self._buffer[y0:y1, x0:x1], src, src_alpha, 0, 0)
+        return self._buffer
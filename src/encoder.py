@@ -0,0 +1,87 @@
+"""
+Encoder profiles shared by every render mode (moviepy, stream, parallel).
+
+  preview  ultrafast x264 for quick local checks
+  upload   CRF x264 at a slower preset: the file that gets uploaded, no re-encode needed
+  target   two-pass x264 at the bitrate that lands on target_mb (env target_mb overrides it)
+
+All profiles use software x264, so output is the same on every machine. Messages are mostly static,
+so every profile uses long GOPs (one keyframe per KEYFRAME_SECONDS) and x264's stillimage tuning.
+Audio is AAC. Frames are streamed once, so the two-pass profile first encodes a lossless
+intermediate (cheap, since consecutive frames barely change) and runs both passes from it.
+"""
+from moviepy.config import FFMPEG_BINARY
+import os, subprocess, tempfile
+import metrics
+
+
+PROFILES = {
+    "preview": {"preset": "ultrafast", "crf": 28},
+    "upload": {"preset": "medium", "crf": 20},
+    "target": {"preset": "medium", "target_mb": 30},
+}
+DEFAULT_PROFILE = "upload"
+KEYFRAME_SECONDS = 10
+AUDIO_CODEC = "aac"
+AUDIO_BITRATE_KBPS = 160
+MUX_OVERHEAD = 0.02  # share of the target size reserved for the mp4 container
+MIN_VIDEO_BITRATE_KBPS = 100
+
+
+def is_two_pass(profile: str) -> bool:
+    return "target_mb" in PROFILES[profile]
+
+
+def x264_params(profile: str, fps: int) -> tuple:
+    """(preset, extra ffmpeg params) of a single-pass encode; for two-pass profiles, of the lossless intermediate."""
+    settings = PROFILES[profile]
+    params = ["-g", str(fps * KEYFRAME_SECONDS), "-tune", "stillimage"]
+    if is_two_pass(profile):
+        return "ultrafast", params + ["-qp", "0"]
+    return settings["preset"], params + ["-crf", str(settings["crf"])]
+
+
+def video_args(profile: str, fps: int, threads: int = 4) -> list:
+    preset, params = x264_params(profile, fps)
+    return ["-vcodec", "libx264", "-preset", preset, *params, "-pix_fmt", "yuv420p", "-threads", str(threads)]
+
+
+def audio_args() -> list:
+    return ["-acodec", AUDIO_CODEC, "-b:a", f"{AUDIO_BITRATE_KBPS}k"]
+
+
+def moviepy_args(profile: str, fps: int) -> dict:
+    """Keyword arguments for VideoClip.write_videofile."""
+    preset, params = x264_params(profile, fps)
+    return {"codec": "libx264", "preset": preset, "ffmpeg_params": params, "audio_codec": AUDIO_CODEC, "audio_bitrate": f"{AUDIO_BITRATE_KBPS}k"}
+
+
+def target_mb(profile: str) -> float:
+    return float(os.getenv("target_mb") or PROFILES[profile]["target_mb"])
+
+
+def video_bitrate(target: float, duration: float) -> int:
+    """kbps of video that, with the audio and container overhead, fills target MB over duration seconds."""
+    total_kbps = target * 1024**2 * 8 / 1000 / duration * (1 - MUX_OVERHEAD)
+    return max(int(total_kbps - AUDIO_BITRATE_KBPS), MIN_VIDEO_BITRATE_KBPS)
+
+
+def two_pass(source_path: str, output_path: str, duration: float, fps: int, profile: str, audio_path: str = None, threads: int = 4):
+    """
+    Re-encode source_path (the lossless intermediate) in two passes to the profile's target size.
+    Audio comes from audio_path, or is copied from the source when there is none.
+    """
+    bitrate = video_bitrate(target_mb(profile), duration)
+    with metrics.tracer.span("encode", profile=profile, passes=2, kbps=bitrate), tempfile.TemporaryDirectory() as tmp_dir:
+        video = [
+            "-vcodec", "libx264", "-preset", PROFILES[profile]["preset"], "-b:v", f"{bitrate}k",
+            "-g", str(fps * KEYFRAME_SECONDS), "-tune", "stillimage", "-pix_fmt", "yuv420p",
+            "-threads", str(threads), "-passlogfile", os.path.join(tmp_dir, "x264"),
+        ]
+        base = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", source_path]
+        subprocess.run(base + ["-map", "0:v", *video, "-pass", "1", "-an", "-f", "null", os.devnull], check=True)
+        if audio_path:
+            audio = ["-i", audio_path, "-map", "0:v", "-map", "1:a", *audio_args()]
+        else:
+            audio = ["-map", "0:v", "-map", "0:a?", "-c:a", "copy"]
+        subprocess.run(base + [*audio, *video, "-pass", "2", output_path], check=True)
@@ -1,21 +1,30 @@
 from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
+import re
+import threading
+import metrics
 import utils
+import scenario_rules
+from chat_data import ChatRawData
 from datetime import datetime as dt
 from dotenv import load_dotenv
 import random
 import numpy as np
-@utils.debug_print
-def generate_scenario(content, save: bool, filename: str, translate: bool = False):
-    load_dotenv("../env")
-    sound_dir = "./asset/sounds"
-    effect_list = []
-    animation_list = []
-    sound_prompt_list = " | ".join(
-        [f'"{os.path.join(root, f)}"' for root, dirs, files in os.walk(sound_dir) for f in files if not f.endswith(".Identifier") or not f.endswith(".aup3")]
-    )
-    print(sound_prompt_list)
+
+
+CACHE_DIR = "./cache/llm"
+CHARS_PER_TOKEN = 2  # conservative for mixed Korean/English chat logs
+MAX_WINDOW_TOKENS = 6000
+MAX_CONCURRENT_REQUESTS = 8
+MAX_RETRIES = 3
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+def build_prompt():
+    # sound, animation and duration are assigned by scenario_rules, so the model only masks, translates and titles
     prompt = f"""
     You are a data transformation expert. Convert a JSON chat log into a valid JSON object with keys: "descriptions", "chatters", "contents".
 
@@ -28,13 +37,10 @@ def generate_scenario(content, save: bool, filename: str, translate: bool = Fals
     - Values: object with "avatarURL" key only, no duplicate URLs.
 
     3. "contents" array:
-    - Each item: "username", "content" (mask private info like 김정환→김XX, exclude celebrities), "timestamp", "attachments" (first with "url", "content_type"), "sound" (from {sound_prompt_list}, default: "{sound_dir}/discord-notification.mp3"), "effect" (from {effect_list}), "animation" (from {animation_list}), "duration".
+    - Each item: "username", "content" (mask private info like 김정환→김XX, exclude celebrities), "timestamp", "attachments" (first with "url", "content_type").
+    - Keep "system": true on every item made from a message that has it (bot or Discord-generated messages); omit it otherwise.
 
     Rules:
-    - Animation: Attachment → "scaleFade", <20 chars → "pop", >50 chars → "slideUp", system/bot → "none".
-    - Sound: you have to choose appropriate sound file according to context of chats. the given list of sound is this:{sound_prompt_list} , default use is "{sound_dir}/discord-notification.mp3" but you have to avoid default use as you could.
-    and you can designate like this:"{sound_dir}/*.mp3", and ignore files that are not audio files like .identifier,aup3, etc., except audio files like mp3 etc.
-    - Duration: <20 chars → 1–1.5s, 20–50 chars → 2–2.5s, >50 chars → 3–3.5s, system/bot → 1s.
     - Language: If translate=false, keep original; if true, translate all (content, title).
 
     Output: Valid JSON, double-quoted keys, no explanations, markdown, or extra text.
@@ -49,32 +55,150 @@ def generate_scenario(content, save: bool, filename: str, translate: bool = Fals
     print file into one line.
     """
 
+    return prompt
+
+
+def estimate_tokens(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False)) // CHARS_PER_TOKEN + 1
+
+
+def split_windows(content, max_tokens: int = MAX_WINDOW_TOKENS) -> list:
+    """
+    Split a chat log (ChatRawData, or its {"chatters", "contents"} dict) into consecutive message windows
+    of bounded token size, each with its own chatters.
+    """
+    chat = content if isinstance(content, ChatRawData) else ChatRawData(content)
+    windows, current, size = [], [], 0
+    for msg in chat.iter_messages():
+        tokens = estimate_tokens(msg)
+        if current and size + tokens > max_tokens:
+            windows.append(current)
+            current, size = [], 0
+        current.append(msg)
+        size += tokens
+    if current:
+        windows.append(current)
+
+    return [
+        {"chatters": {name: chat.chatter(name) for name in {msg.get("name") for msg in window}}, "contents": window}
+        for window in windows
+    ]
+
+
+def parse_output(text: str) -> dict:
+    """Parse a completion, tolerating the code fences the model is told not to print."""
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text.strip())
+    return json.loads(text)
+
+
+def validate_scenario(output) -> dict:
+    """Check a (partial) scenario against the expected schema; raises ValueError on the first problem."""
+    if not isinstance(output, dict):
+        raise ValueError("scenario is not an object")
+    if not isinstance(output.get("descriptions", {}), dict):
+        raise ValueError('"descriptions" is not an object')
+    if not isinstance(output.get("chatters"), dict):
+        raise ValueError('"chatters" is not an object')
+    for name, chatter in output["chatters"].items():
+        if not isinstance(chatter, dict) or not isinstance(chatter.get("avatarURL", ""), (str, type(None))):
+            raise ValueError(f'chatter "{name}" is malformed')
+    if not isinstance(output.get("contents"), list):
+        raise ValueError('"contents" is not an array')
+    for i, msg in enumerate(output["contents"]):
+        if not isinstance(msg, dict) or not isinstance(msg.get("username"), str) or not isinstance(msg.get("content", ""), str):
+            raise ValueError(f"contents[{i}] needs string username and content")
+        if not isinstance(msg.get("attachments", []), list):
+            raise ValueError(f"contents[{i}].attachments is not an array")
+        if not isinstance(msg.get("system", False), bool):
+            raise ValueError(f"contents[{i}].system is not a boolean")
+        if "duration" in msg and not isinstance(msg["duration"], (int, float)):
+            raise ValueError(f"contents[{i}].duration is not a number")
+    return output
+
+
+def cache_key(model: str, prompt: str, window: dict, translate: bool) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    chunk_hash = hashlib.sha256(json.dumps([window, translate], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{model}\n{prompt_hash}\n{chunk_hash}".encode("utf-8")).hexdigest()
+
+
+def complete_window(client: OpenAI, model: str, prompt: str, window: dict, translate: bool) -> dict:
+    """
+    Validated scenario for one window, read from the disk cache keyed by (model, prompt hash, chunk hash)
+    or requested from the model, retrying only this window when the output does not validate.
+    """
+    cache_path = os.path.join(CACHE_DIR, f"{cache_key(model, prompt, window, translate)}.json")
+    if os.path.isfile(cache_path):
+        metrics.tracer.count("llm.cache_hit")
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": str(window)},
+        {"role": "user", "content": f"tranlsate={translate}"},
+    ]
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            metrics.tracer.count("llm.requests")
+            with metrics.tracer.span("llm", messages=len(window["contents"]), attempt=attempt):
+                completion = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                )
+            #남겨두세요 만일을 위해 ^^
+            # print(
+            #     f"""
+            #     ======AI RAW DATA======
+            #     {completion.choices[0].message.content}
+            #     =======================
+            #     """
+            # )
+            output = validate_scenario(parse_output(completion.choices[0].message.content))
+            break
+        except Exception as e:
+            print(f"⚠️ Scenario window failed (attempt {attempt}/{MAX_RETRIES}): {e}")
+            if attempt == MAX_RETRIES:
+                raise
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # unique per writer: batch/service workers and this module's threads may complete the same window at once
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return output
+
+
+def merge_scenarios(parts: list) -> dict:
+    """Merge window scenarios in order: first title/watermark found, union of chatters, concatenated contents."""
+    merged = {"descriptions": {}, "chatters": {}, "contents": []}
+    for part in parts:
+        for key, value in part.get("descriptions", {}).items():
+            merged["descriptions"].setdefault(key, value)
+        for name, chatter in part["chatters"].items():
+            merged["chatters"].setdefault(name, chatter)
+        merged["contents"].extend(part["contents"])
+    return merged
+
+
+@utils.debug_print
+def generate_scenario(content, save: bool, filename: str, translate: bool = False):
+    load_dotenv("../env")
+    prompt = build_prompt()
+
     # ai-generation part
     OPENROUTERTOKEN:str = os.getenv("OPENROUTERTOKEN")
     OPENROUTER_MODEL:str = os.getenv("OPENROUTER_MODEL")
     client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
+        base_url=os.getenv("OPENROUTER_BASE_URL") or OPENROUTER_BASE_URL,
         api_key=OPENROUTERTOKEN,
     )
 
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": str(content)},
-        {"role": "user", "content": f"tranlsate={translate}"},
-    ]
-    completion = client.chat.completions.create(
-        model=OPENROUTER_MODEL,
-        messages=messages,
-    )
-    #남겨두세요 만일을 위해 ^^
-    # print(
-    #     f"""
-    #     ======AI RAW DATA======
-    #     {completion.choices[0].message.content}
-    #     =======================
-    #     """
-    # )
-    output = json.loads(completion.choices[0].message.content)
+    windows = split_windows(content)
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as pool:
+        parts = list(pool.map(lambda window: complete_window(client, OPENROUTER_MODEL, prompt, window, translate), windows))
+    output = scenario_rules.apply_rules(merge_scenarios(parts))
     if save:
         file_src = f"./scenarios/{filename}_{dt.now().strftime('%y%m%d-%H%M%S')}.json"
         if os.path.isfile(file_src):
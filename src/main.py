@@ -1,13 +1,22 @@
 import os
 import json
 import uuid
+import argparse
 import datetime as dt
 from dotenv import load_dotenv
 from simpleeval import simple_eval
 
 from generate_scenario import generate_scenario
 from scrap_discord import extract_chat
+from multi_scrap import extract_chats
 from shorts import generate_discord_chat_shorts
+from stream_render import render_streaming
+from parallel_render import render_parallel
+from scene_cache import render_cached
+from preview import render_preview
+from shorts import DEFAULT_FONT
+from encoder import DEFAULT_PROFILE
+import metrics
 
 
 def load_config(env_path: str = "../.env") -> dict:
@@ -21,7 +30,13 @@ def load_config(env_path: str = "../.env") -> dict:
         "after": os.getenv("after"),
         "before": os.getenv("before"),
         "token": os.getenv("TOKEN"),
-        "channel_id": os.getenv("CHANNEL_ID"),
+        "channel_ids": [c.strip() for c in (os.getenv("CHANNEL_ID") or "").split(",") if c.strip()],
+        "render_mode": os.getenv("render_mode") or "moviepy",
+        "render_workers": int(os.getenv("render_workers") or os.cpu_count()),
+        "encoder_profile": os.getenv("encoder_profile") or DEFAULT_PROFILE,
+        "title_font": os.getenv("title_font") or DEFAULT_FONT,
+        "message_font": os.getenv("message_font") or "./asset/fonts/SejongGeulggot.ttf",
+        "watermark_font": os.getenv("watermark_font") or DEFAULT_FONT,
     }
 
 
@@ -36,39 +51,91 @@ def load_scenario_from_file(path: str) -> dict:
         return json.load(f)
 
 
-def build_scenario(config: dict) -> dict:
-    """Build scenario either from file or by extracting Discord chat."""
+def build_scenarios(config: dict) -> list:
+    """Build (filename, scenario) pairs either from file or by extracting Discord chat of every channel."""
     if config["load_from_file"]:
-        return load_scenario_from_file(config["scenario_src"])
+        return [(config["filename"], load_scenario_from_file(config["scenario_src"]))]
 
     timezone = dt.timezone(dt.timedelta(hours=9))  # KST
     after = parse_datetime(config["after"], timezone)
     before = parse_datetime(config["before"], timezone)
 
-    chat_data = extract_chat(
-        config["token"],
-        config["channel_id"],
-        filename=config["filename"],
-        save=True,
-        after=after,
-        before=before,
-        timezone=timezone,
-    )
-    return generate_scenario(
-        content=chat_data.get_data(), save=True, filename=config["filename"]
+    if len(config["channel_ids"]) == 1:
+        chats = [
+            (config["filename"], extract_chat(
+                config["token"],
+                config["channel_ids"][0],
+                filename=config["filename"],
+                save=True,
+                after=after,
+                before=before,
+                timezone=timezone,
+            ))
+        ]
+    else:
+        # 여러 채널은 동시에 받아옵니다.
+        jobs = [
+            {"channel_id": channel_id, "after": after, "before": before, "filename": f"{config['filename']}_{channel_id}"}
+            for channel_id in config["channel_ids"]
+        ]
+        chats = list(zip([job["filename"] for job in jobs], extract_chats(config["token"], jobs, timezone, save=True)))
+
+    return [
+        (filename, generate_scenario(content=chat_data, save=True, filename=filename))
+        for filename, chat_data in chats
+    ]
+
+
+def render_scenario(config: dict, filename: str, scenario: dict):
+    """Render one scenario with the configured render mode."""
+    output_filename = f"{filename}_{uuid.uuid1()}"
+    options = {"profile": config["encoder_profile"]}
+    if config["render_mode"] == "parallel":
+        render = render_parallel
+        options["workers"] = config["render_workers"]
+    elif config["render_mode"] == "stream":
+        render = render_streaming
+    elif config["render_mode"] == "cached":
+        render = render_cached
+    elif config["render_mode"] == "preview":
+        render = render_preview
+        options = {}
+    else:
+        render = generate_discord_chat_shorts
+    return render(
+        scenario=scenario,
+        filename=output_filename,
+        title_font=config["title_font"],
+        message_font=config["message_font"],
+        watermark_font=config["watermark_font"],
+        **options,
     )
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Discord chat to shorts video.")
+    parser.add_argument("--trace", help="write per-stage/per-message timings, counters and peak RSS as JSON")
+    parser.add_argument("--chrome-trace", help="write the same trace in Chrome trace event format")
+    parser.add_argument("--profile", help="attach cProfile to frame generation and write the stats here")
+    return parser.parse_args()
+
+
 def main():
-    config = load_config()
-    scenario = build_scenario(config)
+    args = parse_args()
+    if args.profile:
+        metrics.tracer.enable_profiler()
 
-    output_filename = f"{config['filename']}_{uuid.uuid1()}"
-    generate_discord_chat_shorts(
-        scenario=scenario,
-        filename=output_filename,
-        message_font="./asset/fonts/SejongGeulggot.ttf",
-    )
+    config = load_config()
+    for filename, scenario in build_scenarios(config):
+        render_scenario(config, filename, scenario)
+
+    metrics.tracer.print_summary()
+    if args.trace:
+        metrics.tracer.write_json(args.trace)
+    if args.chrome_trace:
+        metrics.tracer.write_chrome_trace(args.chrome_trace)
+    if args.profile:
+        metrics.tracer.write_profile(args.profile)
 
 
 if __name__ == "__main__":
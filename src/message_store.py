@@ -0,0 +1,70 @@
+import json, os, sqlite3, threading
+
+
+STORE_DIR = "./chats/store"
+
+
+class MessageStore:
+    """
+    Local SQLite store of one channel's raw Discord messages, keyed by snowflake ID.
+    `covered` records the [lo, hi) snowflake ranges that were fully fetched, so an export only
+    requests the gaps and an interrupted export resumes from the last stored page.
+    """
+
+    def __init__(self, channel_id: str, root: str = None):
+        root = root or STORE_DIR
+        os.makedirs(root, exist_ok=True)
+        self.channel_id = channel_id
+        self.path = os.path.join(root, f"{channel_id}.sqlite3")
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS covered (lo INTEGER NOT NULL, hi INTEGER NOT NULL);
+            """
+        )
+
+    def close(self):
+        self.db.close()
+
+    def ranges(self) -> list:
+        return [tuple(row) for row in self.db.execute("SELECT lo, hi FROM covered ORDER BY lo")]
+
+    def gaps(self, lo: int, hi: int) -> list:
+        """Uncovered [lo, hi) sub-ranges of the window, newest first (the order pages are fetched in)."""
+        gaps, cursor = [], lo
+        for range_lo, range_hi in self.ranges():
+            if range_hi <= cursor:
+                continue
+            if range_lo >= hi:
+                break
+            if range_lo > cursor:
+                gaps.append((cursor, range_lo))
+            cursor = max(cursor, range_hi)
+        if cursor < hi:
+            gaps.append((cursor, hi))
+        return gaps[::-1]
+
+    def add_page(self, messages: list, lo: int, hi: int):
+        """Store a page of messages and mark [lo, hi) as covered in one transaction."""
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO messages (id, data) VALUES (?, ?)",
+                [(int(msg["id"]), json.dumps(msg, ensure_ascii=False)) for msg in messages],
+            )
+            if lo < hi:
+                self._cover(lo, hi)
+
+    def _cover(self, lo: int, hi: int):
+        """Insert [lo, hi) and merge it with every overlapping or adjacent range."""
+        overlapping = self.db.execute("SELECT lo, hi FROM covered WHERE hi >= ? AND lo <= ?", (lo, hi)).fetchall()
+        for range_lo, range_hi in overlapping:
+            lo, hi = min(lo, range_lo), max(hi, range_hi)
+        self.db.execute("DELETE FROM covered WHERE hi >= ? AND lo <= ?", (lo, hi))
+        self.db.execute("INSERT INTO covered (lo, hi) VALUES (?, ?)", (lo, hi))
+
+    def messages_between(self, lo: int, hi: int):
+        """Raw messages with lo <= id < hi, oldest first."""
+        for (data,) in self.db.execute("SELECT data FROM messages WHERE id >= ? AND id < ? ORDER BY id", (lo, hi)):
+            yield json.loads(data)
@@ -0,0 +1,154 @@
+from collections import Counter
+from contextlib import contextmanager
+import cProfile, functools, io, json, os, pstats, sys, threading, time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (0 where unsupported)."""
+    # Linux keeps ru_maxrss across exec, so a spawned child would report its parent's size at fork;
+    # VmHWM belongs to the current address space only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+class Tracer:
+    """
+    Collects spans (stage timings), counters and peak RSS for one process.
+    Output formats: colored console lines, a JSON trace and Chrome's trace event format.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.messages = {}  # message index -> frames and compose seconds
+        self.profiler = None
+        self.logger = None  # proglog logger for render progress (see service.py); None keeps each renderer's default
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, cat: str = "stage", **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.spans.append({
+                    "name": name, "cat": cat, "start": start - self.origin, "duration": end - start,
+                    "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+                })
+
+    def add(self, name: str, duration: float, cat: str = "stage", **args):
+        """Record a span measured elsewhere (e.g. time accumulated across frames), ending now."""
+        end = time.perf_counter()
+        with self._lock:
+            self.spans.append({
+                "name": name, "cat": cat, "start": end - duration - self.origin, "duration": duration,
+                "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+            })
+
+    def add_frame(self, index: int, seconds: float):
+        """Accumulate per-message frame composition time (too many frames for one span each)."""
+        with self._lock:
+            message = self.messages.setdefault(index, {"frames": 0, "compose": 0.0})
+            message["frames"] += 1
+            message["compose"] += seconds
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def stage_totals(self) -> dict:
+        totals = Counter()
+        for span in self.spans:
+            if span["cat"] == "stage":
+                totals[span["name"]] += span["duration"]
+        if self.messages:
+            totals["compose"] += sum(message["compose"] for message in self.messages.values())
+        return dict(totals)
+
+    def to_json(self) -> dict:
+        return {
+            "stages": self.stage_totals(),
+            "spans": self.spans,
+            "messages": self.messages,
+            "counters": dict(self.counters),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+
+    def write_chrome_trace(self, path: str):
+        """Trace event format, viewable in chrome://tracing or Perfetto."""
+        events = [
+            {
+                "name": span["name"], "cat": span["cat"], "ph": "X",
+                "ts": span["start"] * 1e6, "dur": span["duration"] * 1e6,
+                "pid": span["pid"], "tid": span["tid"], "args": span["args"],
+            }
+            for span in self.spans
+        ]
+        end = max((span["start"] + span["duration"] for span in self.spans), default=0.0)
+        events += [
+            {"name": name, "ph": "C", "ts": end * 1e6, "pid": os.getpid(), "args": {name: value}}
+            for name, value in self.counters.items()
+        ]
+        events.append({"name": "peak_rss_mb", "ph": "C", "ts": end * 1e6, "pid": os.getpid(), "args": {"peak_rss_mb": peak_rss_mb()}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def print_summary(self):
+        """Console format, colored like utils.debug_print."""
+        for name, total in sorted(self.stage_totals().items(), key=lambda item: -item[1]):
+            print(f"\033[34m{name:>14}\033[0m {total:9.3f}s")
+        for name, value in sorted(self.counters.items()):
+            print(f"\033[32m{name:>28}\033[0m {value}")
+        print(f"\033[32m{'peak_rss_mb':>28}\033[0m {peak_rss_mb():.0f}")
+
+    # --- cProfile on the frame hot path ---
+    def enable_profiler(self):
+        self.profiler = cProfile.Profile()
+
+    def write_profile(self, path: str, top: int = 25):
+        if self.profiler is None:
+            return
+        self.profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(top)
+        print(output.getvalue())
+
+
+tracer = Tracer()
+
+
+def profiled(function):
+    """Run function under the tracer's profiler when profiling is enabled (see main.py --profile)."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if tracer.profiler is None:
+            return function(*args, **kwargs)
+        tracer.profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            tracer.profiler.disable()
+
+    return wrapper
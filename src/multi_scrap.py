@@ -0,0 +1,138 @@
+import asyncio
+import datetime as dt
+import json
+import time
+import httpx
+import metrics
+import utils
+from message_store import MessageStore
+from scrap_discord import (
+    DISCORD_API, PAGE_LIMIT, MAX_RATE_LIMIT_RETRIES, ChatRawData,
+    build_chat_data, datetime_to_snowflake, make_headers, message_to_content, store_page,
+)
+
+
+MAX_CONNECTIONS = 20
+# Discord allows 50 requests per second per token across all routes; stay under it so a global 429 never happens
+GLOBAL_REQUESTS_PER_SECOND = 45
+GLOBAL_BURST = 10
+
+
+class RateLimiter:
+    """
+    Throttles requests per Discord rate-limit bucket using the X-RateLimit-* response headers, and all
+    requests together with a token bucket under the global limit.
+    A bucket that runs out only delays requests on that bucket; a global 429 (if one still happens) pauses everyone.
+    """
+
+    def __init__(self, rate: float = GLOBAL_REQUESTS_PER_SECOND, burst: int = GLOBAL_BURST):
+        self.buckets = {}  # route -> bucket key
+        self.state = {}  # bucket key -> (remaining, reset_at)
+        # route -> asyncio.Lock, serializes requests within a bucket: bucket keys include their route, and
+        # keying by route keeps one lock when the route's bucket is learned mid-flight
+        self.locks = {}
+        self.global_until = 0.0
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+
+    def _bucket(self, route: str) -> str:
+        return self.buckets.get(route, route)
+
+    def lock(self, route: str) -> asyncio.Lock:
+        return self.locks.setdefault(route, asyncio.Lock())
+
+    async def wait(self, route: str):
+        """Sleep until a request on route is allowed."""
+        while True:
+            now = time.monotonic()
+            remaining, reset_at = self.state.get(self._bucket(route), (1, 0.0))
+            delay = max(self.global_until - now, reset_at - now if remaining <= 0 else 0.0)
+            if delay <= 0:
+                # no await between the check and taking the token, so concurrent waiters can't overdraw it
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+
+    def update(self, route: str, response: httpx.Response):
+        headers = response.headers
+        if "X-RateLimit-Bucket" in headers:
+            # buckets are shared per major parameter, which is part of the route here
+            self.buckets[route] = f"{headers['X-RateLimit-Bucket']}:{route}"
+        bucket = self._bucket(route)
+        if "X-RateLimit-Remaining" in headers and "X-RateLimit-Reset-After" in headers:
+            self.state[bucket] = (int(headers["X-RateLimit-Remaining"]), time.monotonic() + float(headers["X-RateLimit-Reset-After"]))
+        if response.status_code == 429:
+            retry_after = float(headers.get("Retry-After") or response.json().get("retry_after", 1))
+            if headers.get("X-RateLimit-Global") == "true" or headers.get("X-RateLimit-Scope") == "global":
+                self.global_until = max(self.global_until, time.monotonic() + retry_after)
+            else:
+                self.state[bucket] = (0, time.monotonic() + retry_after)
+
+
+async def fetch_page(client: httpx.AsyncClient, limiter: RateLimiter, channel_id: str, before: int) -> list:
+    """Async counterpart of scrap_discord.fetch_page that goes through the rate limiter."""
+    route = f"GET /channels/{channel_id}/messages"
+    url = f"{DISCORD_API}/channels/{channel_id}/messages"
+    for _ in range(MAX_RATE_LIMIT_RETRIES):
+        async with limiter.lock(route):
+            await limiter.wait(route)
+            res = await client.get(url, params={"before": before, "limit": PAGE_LIMIT})
+            metrics.tracer.count("discord.requests")
+            limiter.update(route, res)
+        if res.status_code == 429:
+            continue
+        if res.status_code != 200:
+            print(f"Error {res.status_code} while fetching messages of {channel_id} before {before}")
+            return None
+        return json.loads(res.content.decode("utf-8"))
+    return None
+
+
+async def fill_gap(client: httpx.AsyncClient, limiter: RateLimiter, store: MessageStore, channel_id: str, lo: int, hi: int) -> bool:
+    """Async counterpart of scrap_discord.fill_gap."""
+    cursor = hi
+    while cursor > lo:
+        page = await fetch_page(client, limiter, channel_id, cursor)
+        if page is None:
+            return False
+        cursor = store_page(store, page, lo, cursor)
+    return True
+
+
+async def scrape_channel(client: httpx.AsyncClient, limiter: RateLimiter, job: dict, timezone: dt.timezone, save: bool) -> ChatRawData:
+    """Export one job = {"channel_id", "after", "before", "filename"} through the channel's MessageStore."""
+    store = MessageStore(job["channel_id"])
+    after_snowflake = datetime_to_snowflake(job["after"])
+    before_snowflake = min(datetime_to_snowflake(job["before"]), datetime_to_snowflake(dt.datetime.now(dt.timezone.utc)))
+    try:
+        for gap_lo, gap_hi in store.gaps(after_snowflake, before_snowflake):
+            if not await fill_gap(client, limiter, store, job["channel_id"], gap_lo, gap_hi):
+                print(f"⚠️ Export of {job['channel_id']} is incomplete; the next run resumes from the last stored page")
+                break
+        messages = (message_to_content(msg, timezone) for msg in store.messages_between(after_snowflake, datetime_to_snowflake(job["before"])))
+        return build_chat_data(messages, job.get("filename") or job["channel_id"], save)
+    finally:
+        store.close()
+
+
+async def scrape_channels(token: str, jobs: list, timezone: dt.timezone, save: bool = False) -> list:
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    with metrics.tracer.span("scrape", channels=len(jobs)):
+        async with httpx.AsyncClient(headers=make_headers(token), limits=limits, timeout=30) as client:
+            limiter = RateLimiter()
+            return await asyncio.gather(*(scrape_channel(client, limiter, job, timezone, save) for job in jobs))
+
+
+@utils.debug_print
+def extract_chats(token: str, jobs: list, timezone: dt.timezone, save: bool = False) -> list:
+    """
+    Export many channels/windows concurrently on one pooled async client.
+    Returns one ChatRawData per job, in job order.
+    """
+    return asyncio.run(scrape_channels(token, jobs, timezone, save))
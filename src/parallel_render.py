@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor
+from moviepy.config import FFMPEG_BINARY
+import json, os, subprocess, sys, tempfile, time
+import encoder
+import prefetch
+import shorts
+import stream_render
+import utils
+
+
+SEGMENTS_PER_WORKER = 2  # more segments than workers evens out gif-heavy segments
+
+
+def split_segments(starts: list, total: float, count: int) -> list:
+    """Split message indices into at most `count` contiguous [first, last) ranges of similar duration."""
+    count = max(1, min(count, len(starts)))
+    bounds = [0]
+    for i in range(1, count):
+        target = total * i / count
+        index = next((j for j, start in enumerate(starts) if start >= target), len(starts))
+        if bounds[-1] < index < len(starts):
+            bounds.append(index)
+    bounds.append(len(starts))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def render_segment(scenario: dict, starts: list, total: float, first: int, last: int, fonts: dict, output_path: str, profile: str = encoder.DEFAULT_PROFILE) -> tuple:
+    """Worker: encode messages [first, last) without audio on the global frame grid (losslessly for two-pass profiles)."""
+    overlays = shorts.create_overlays(scenario.get("descriptions", {}), fonts["title_font"], fonts["watermark_font"])
+    frames = stream_render.iter_frames(scenario, starts, total, fonts["message_font"], overlays, first=first, last=last)
+    started = time.perf_counter()
+    count = stream_render.pipe_frames(frames, output_path, shorts.FPS, profile=profile)
+    return count, time.perf_counter() - started
+
+
+def concat_segments(segment_paths: list, audio_path: str, output_path: str, total: float, profile: str = encoder.DEFAULT_PROFILE):
+    """
+    Join segments with the concat demuxer (no video re-encode) and mux the audio mixed once over the whole timeline.
+    For two-pass profiles the joined lossless segments are the intermediate both passes read.
+    """
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    concat = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    try:
+        if encoder.is_two_pass(profile):
+            intermediate_path = f"{output_path}.lossless.mp4"
+            subprocess.run(concat + ["-map", "0:v", "-c:v", "copy", "-an", intermediate_path], check=True)
+            try:
+                encoder.two_pass(intermediate_path, output_path, total, shorts.FPS, profile, audio_path)
+            finally:
+                os.remove(intermediate_path)
+        else:
+            subprocess.run(concat + ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:v", "copy", *encoder.audio_args(), output_path], check=True)
+    finally:
+        os.remove(list_path)
+
+
+@utils.debug_print
+def render_parallel(
+    scenario: dict,
+    title_font: str = shorts.DEFAULT_FONT,
+    message_font: str = shorts.DEFAULT_FONT,
+    watermark_font: str = shorts.DEFAULT_FONT,
+    filename: str = "output",
+    workers: int = os.cpu_count(),
+    profile: str = encoder.DEFAULT_PROFILE,
+) -> dict:
+    """
+    Render segments split at message boundaries in separate processes, then concatenate them losslessly.
+    Returns frame count and wall time so throughput can be compared across worker counts.
+    """
+    contents = scenario.get("contents", [])
+    if not contents:
+        print("No messages to generate.")
+        return
+
+    # Resolve assets once so every worker only reads the disk cache
+    prefetch.prefetch_assets(scenario, shorts.AVATAR_SIZE, shorts.ATTACHMENT_SIZE, report=False)
+    started = time.perf_counter()
+    starts, total = stream_render.plan_timeline(contents)
+    segments = split_segments(starts, total, workers * SEGMENTS_PER_WORKER)
+    fonts = {"title_font": title_font, "message_font": message_font, "watermark_font": watermark_font}
+
+    output_dir = "./output"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{filename}.mp4")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        segment_paths = [os.path.join(tmp_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(render_segment, scenario, starts, total, first, last, fonts, path, profile)
+                for (first, last), path in zip(segments, segment_paths)
+            ]
+            audio_path = os.path.join(tmp_dir, "audio.wav")
+            stream_render.write_audio_track(scenario, starts, total, audio_path)
+            frame_count = sum(future.result()[0] for future in futures)
+        concat_segments(segment_paths, audio_path, output_path, total, profile)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Video generated successfully: {output_path} ({frame_count} frames, {workers} workers, {frame_count / elapsed:.1f} fps)")
+    return {"workers": workers, "frames": frame_count, "seconds": elapsed, "fps": frame_count / elapsed}
+
+
+def benchmark_workers(scenario: dict, worker_counts: list, **fonts) -> list:
+    """Render the same scenario with each worker count and print how throughput scales."""
+    results = []
+    for workers in worker_counts:
+        results.append(render_parallel(scenario, filename=f"bench_{workers}_workers", workers=workers, **fonts))
+    base = results[0]["fps"]
+    print("workers      fps  speedup")
+    for result in results:
+        print(f"{result['workers']:>7} {result['fps']:8.1f} {result['fps'] / base:7.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    # python src/parallel_render.py <scenario.json> 1 2 4 8 16 32
+    with open(sys.argv[1], encoding="utf-8") as f:
+        benchmark_workers(json.load(f), [int(n) for n in sys.argv[2:]] or [1, os.cpu_count()])
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import asset_cache
+import metrics
+import utils
+
+
+MAX_WORKERS = 16
+
+
+def collect_assets(scenario: dict) -> list:
+    """Walk chatters and contents and return the deduplicated (kind, url) pairs the renderer will load."""
+    assets = []
+    seen = set()
+
+    def add(kind: str, url: str):
+        if url and (kind, url) not in seen:
+            seen.add((kind, url))
+            assets.append((kind, url))
+
+    chatters = scenario.get("chatters", {})
+    for msg in scenario.get("contents", []):
+        add("avatar", chatters.get(msg.get("username"), {}).get("avatarURL"))
+        if msg.get("attachments"):
+            attachment = msg["attachments"][0]
+            if attachment.get("content_type") in ("gif", "image"):
+                add(attachment["content_type"], attachment.get("url"))
+    return assets
+
+
+def fetch_asset(kind: str, url: str, avatar_size: int, attachment_size: int, cache: asset_cache.AssetCache = None) -> dict:
+    """Fetch and decode one asset into the cache, returning its timing record."""
+    timings = {"kind": kind, "url": url}
+    start = time.perf_counter()
+    with metrics.tracer.span(kind, cat="asset", url=url):
+        fetch_into(kind, url, avatar_size, attachment_size, cache, timings)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def fetch_into(kind: str, url: str, avatar_size: int, attachment_size: int, cache: asset_cache.AssetCache, timings: dict):
+    """Load one asset through the loader of its kind, recording success or the error in timings."""
+    try:
+        if kind == "avatar":
+            asset_cache.load_avatar(url, avatar_size, cache, timings)
+        elif kind == "image":
+            asset_cache.load_attachment_image(url, attachment_size, cache, timings)
+        elif kind == "gif":
+            asset_cache.load_animated(url, cache, timings)
+        timings["ok"] = True
+    except Exception as e:
+        timings["ok"] = False
+        timings["error"] = str(e)
+
+
+@utils.debug_print
+def prefetch_assets(
+    scenario: dict,
+    avatar_size: int,
+    attachment_size: int,
+    max_workers: int = MAX_WORKERS,
+    cache: asset_cache.AssetCache = None,
+    report: bool = True,
+) -> list:
+    """
+    Resolve every asset of the scenario concurrently so scene construction only hits the cache.
+    Per-host limits, timeouts and retries are handled by the cache's pooled session.
+    Returns one timing record per asset: source, network/decode seconds and bytes.
+    """
+    assets = collect_assets(scenario)
+    results = []
+    with metrics.tracer.span("asset_fetch", assets=len(assets)), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(fetch_asset, kind, url, avatar_size, attachment_size, cache) for kind, url in assets]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    if report:
+        print_report(results)
+    return results
+
+
+def print_report(results: list):
+    """Print the per-asset timing breakdown, slowest first."""
+    for timing in sorted(results, key=lambda r: r["total"], reverse=True):
+        status = "✅" if timing["ok"] else f"❌ {timing.get('error')}"
+        print(
+            f"{timing['kind']:>6} {timing.get('source', '-'):>11} "
+            f"net {timing.get('network', 0.0):6.2f}s  decode {timing.get('decode', 0.0):6.2f}s  "
+            f"{timing.get('bytes', 0) / 1024:8.1f}KB  {status} {timing['url']}"
+        )
@@ -0,0 +1,151 @@
+"""
+Preview mode: the same layout at a fraction of the resolution and fps, plus a contact sheet with one
+keyframe per message and a JSON timeline of the message durations.
+
+At the default 1/3 scale and 10 fps a frame is 360x640 and there are a third as many of them, so a
+preview composes and encodes ~27x fewer pixels than the full render and needs far less memory.
+
+  python src/preview.py scenarios/<scenario>.json                 # video, contact sheet and timeline
+  python src/preview.py scenarios/<scenario>.json --no-video      # contact sheet and timeline only
+"""
+from PIL import Image, ImageDraw
+import argparse, json, os, tempfile
+import prefetch
+import shorts
+import stream_render
+import text_render
+import utils
+from compositor import FrameCompositor
+
+
+PREVIEW_SCALE = 1 / 3
+PREVIEW_FPS = 10
+SHEET_COLUMNS = 6
+LABEL_HEIGHT = 28
+LABEL_FONT_SIZE = 16
+
+
+def build_timeline(contents: list, starts: list, total: float) -> dict:
+    """Per-message start/duration and what the message shows and plays."""
+    messages = []
+    for index, msg in enumerate(contents):
+        end = starts[index + 1] if index + 1 < len(starts) else total
+        attachments = msg.get("attachments") or []
+        messages.append({
+            "index": index,
+            "username": msg.get("username"),
+            "start": round(starts[index], 3),
+            "duration": round(end - starts[index], 3),
+            "content": msg.get("content", ""),
+            "attachment": attachments[0].get("content_type") if attachments else None,
+            "sound": msg.get("sound"),
+            "animation": msg.get("animation"),
+        })
+    return {"total": round(total, 3), "messages": messages}
+
+
+def render_keyframes(scenario: dict, starts: list, total: float, message_font: str, overlays: list, layout: shorts.Layout) -> list:
+    """One frame per message, taken halfway through its scene."""
+    contents = scenario.get("contents", [])
+    chatters = scenario.get("chatters", {})
+    compositor = FrameCompositor([], layout.size, shorts.BG_COLOR, overlays)
+    frames = []
+    for index, msg in enumerate(contents):
+        end = starts[index + 1] if index + 1 < len(starts) else total
+        scene = shorts.create_message_scene(msg, chatters, message_font, layout)
+        try:
+            frames.append(compositor.render(index, scene, (end - starts[index]) / 2).copy())
+        finally:
+            compositor.release()
+            scene.close()
+    return frames
+
+
+def contact_sheet(frames: list, timeline: dict, font_path: str, columns: int = SHEET_COLUMNS) -> Image.Image:
+    """Keyframes in a grid, each labelled with its index, duration and username."""
+    height, width = frames[0].shape[:2]
+    rows = (len(frames) + columns - 1) // columns
+    sheet = Image.new("RGB", (width * min(columns, len(frames)), (height + LABEL_HEIGHT) * rows), shorts.BG_COLOR)
+    draw = ImageDraw.Draw(sheet)
+    font = text_render.load_font(font_path, LABEL_FONT_SIZE)
+    for frame, msg in zip(frames, timeline["messages"]):
+        x, y = msg["index"] % columns * width, msg["index"] // columns * (height + LABEL_HEIGHT)
+        sheet.paste(Image.fromarray(frame), (x, y))
+        draw.text((x + 4, y + height + 4), f"#{msg['index']} {msg['duration']:.1f}s {msg['username']}", font=font, fill="white")
+    return sheet
+
+
+@utils.debug_print
+def render_preview(
+    scenario: dict,
+    title_font: str = shorts.DEFAULT_FONT,
+    message_font: str = shorts.DEFAULT_FONT,
+    watermark_font: str = shorts.DEFAULT_FONT,
+    filename: str = "output",
+    scale: float = PREVIEW_SCALE,
+    fps: int = PREVIEW_FPS,
+    video: bool = True,
+    sheet: bool = True,
+) -> dict:
+    """Render a scaled-down preview; returns the paths of the video, contact sheet and timeline it wrote."""
+    contents = scenario.get("contents", [])
+    if not contents:
+        print("No messages to generate.")
+        return
+
+    layout = shorts.Layout(scale, fps)
+    prefetch.prefetch_assets(scenario, layout.avatar_size, layout.attachment_size, report=False)
+    starts, total = stream_render.plan_timeline(contents)
+    overlays = shorts.create_overlays(scenario.get("descriptions", {}), title_font, watermark_font, layout)
+    timeline = build_timeline(contents, starts, total)
+
+    output_dir = "./output"
+    os.makedirs(output_dir, exist_ok=True)
+    base_path = os.path.join(output_dir, f"{filename}_preview")
+    outputs = {"timeline": f"{base_path}.json"}
+    with open(outputs["timeline"], "w", encoding="utf-8") as f:
+        json.dump(timeline, f, ensure_ascii=False, indent=2)
+
+    if sheet:
+        outputs["sheet"] = f"{base_path}.png"
+        frames = render_keyframes(scenario, starts, total, message_font, overlays, layout)
+        contact_sheet(frames, timeline, message_font).save(outputs["sheet"])
+
+    if video:
+        outputs["video"] = f"{base_path}.mp4"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            audio_path = os.path.join(tmp_dir, "audio.wav")
+            stream_render.write_audio_track(scenario, starts, total, audio_path)
+            frames = stream_render.iter_frames(scenario, starts, total, message_font, overlays, fps=fps, layout=layout)
+            stream_render.encode_frames(frames, outputs["video"], fps, audio_path, profile="preview", size=layout.size, total=int(total * fps))
+
+    for kind, path in outputs.items():
+        print(f"✅ Preview {kind}: {path}")
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quick low-resolution preview of a scenario.")
+    parser.add_argument("scenario")
+    parser.add_argument("--scale", type=float, default=PREVIEW_SCALE)
+    parser.add_argument("--fps", type=int, default=PREVIEW_FPS)
+    parser.add_argument("--no-video", action="store_true", help="only write the contact sheet and timeline")
+    parser.add_argument("--no-sheet", action="store_true")
+    args = parser.parse_args()
+
+    import main as cli
+
+    config = cli.load_config()
+    with open(args.scenario, encoding="utf-8") as f:
+        scenario = json.load(f)
+    render_preview(
+        scenario,
+        title_font=config["title_font"],
+        message_font=config["message_font"],
+        watermark_font=config["watermark_font"],
+        filename=os.path.splitext(os.path.basename(args.scenario))[0],
+        scale=args.scale,
+        fps=args.fps,
+        video=not args.no_video,
+        sheet=not args.no_sheet,
+    )
@@ -0,0 +1,133 @@
+from collections import Counter
+from functools import lru_cache
+import math
+import os
+import re
+
+
+SOUND_DIR = "./asset/sounds"
+DEFAULT_SOUND = f"{SOUND_DIR}/discord-notification.mp3"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".m4a")
+IMAGE_DURATION = 2.5  # seconds an image without text stays on screen
+
+# filename parts that say nothing about how a sound feels
+STOP_WORDS = {"mp3cut", "net", "sound", "effect", "meme", "hd", "original", "online", "audio", "converter", "360p", "fixed", "www", "youtubetomp4", "the", "a", "of", "1", "5"}
+# chat slang -> words that appear in sound filenames
+KEYWORD_ALIASES = {
+    "ㅋㅋ": ["laugh", "laughing", "heheheha", "muhehehe"],
+    "ㅎㅎ": ["laugh", "rehehehe"],
+    "lol": ["laugh", "lol"],
+    "lmao": ["laugh", "laughing"],
+    "ㅠㅠ": ["emotional", "damage", "died"],
+    "ㅜㅜ": ["emotional", "damage", "died"],
+    "?": ["what", "wait", "why", "suspicious"],
+    "방귀": ["fart"],
+    "죽": ["died", "death"],
+    "헐": ["oh", "gaud", "what"],
+    "안녕": ["hello"],
+    "굿": ["yes"],
+    "ㄴㄴ": ["wrong"],
+    "중국": ["chinese", "social", "credit"],
+}
+
+
+def tokenize(text: str) -> list:
+    """Lowercased words plus Hangul character bigrams, so Korean matches inside compounds."""
+    words = [w for w in re.split(r"[\W_]+", text.lower()) if w and w not in STOP_WORDS]
+    bigrams = [w[i : i + 2] for w in words if re.search(r"[가-힣]", w) for i in range(len(w) - 1)]
+    return words + bigrams
+
+
+class SoundIndex:
+    """Keyword index over sound filenames, weighted by inverse document frequency."""
+
+    def __init__(self, sound_dir: str = SOUND_DIR):
+        self.paths = sorted(
+            os.path.join(root, f).replace(os.sep, "/")
+            for root, dirs, files in os.walk(sound_dir)
+            for f in files
+            if f.lower().endswith(AUDIO_EXTENSIONS)
+        )
+        self.keywords = {path: set(tokenize(os.path.splitext(os.path.basename(path))[0])) for path in self.paths}
+        frequency = Counter(keyword for keywords in self.keywords.values() for keyword in keywords)
+        self.idf = {keyword: math.log((1 + len(self.paths)) / (1 + count)) + 1 for keyword, count in frequency.items()}
+
+    def query_terms(self, text: str) -> set:
+        terms = set(tokenize(text))
+        for slang, words in KEYWORD_ALIASES.items():
+            if slang in text.lower():
+                terms.update(words)
+        return terms
+
+    def choose(self, text: str, default: str = DEFAULT_SOUND) -> str:
+        """Best matching sound for a message; ties go to the first path, no match gives the default."""
+        terms = self.query_terms(text)
+        best, best_score = default, 0.0
+        for path in self.paths:
+            score = sum(self.idf[keyword] for keyword in self.keywords[path] & terms)
+            if score > best_score:
+                best, best_score = path, score
+        return best
+
+
+@lru_cache(maxsize=None)
+def sound_index(sound_dir: str = SOUND_DIR) -> SoundIndex:
+    """Index built once per process."""
+    return SoundIndex(sound_dir)
+
+
+def is_system(msg: dict) -> bool:
+    return bool(msg.get("bot") or msg.get("system"))
+
+
+def assign_animation(msg: dict) -> str:
+    """Attachment → scaleFade, system/bot → none, <20 chars → pop, >50 chars → slideUp."""
+    length = len(msg.get("content", ""))
+    if msg.get("attachments"):
+        return "scaleFade"
+    if is_system(msg):
+        return "none"
+    if length < 20:
+        return "pop"
+    if length > 50:
+        return "slideUp"
+    return "none"
+
+
+def gif_duration(msg: dict) -> float:
+    """How long a gif message plays: the gif's own length within shorts.GIF_MAX_DURATION, as the renderer times it."""
+    import shorts  # moviepy and the asset cache, only needed once a scenario has gifs
+
+    try:
+        return round(shorts.message_duration(msg), 2)
+    except Exception as e:
+        print(f"⚠️ Gif length unknown, using {shorts.GIF_MAX_DURATION}s: {msg['attachments'][0].get('url')}, {e}")
+        return shorts.GIF_MAX_DURATION
+
+
+def assign_duration(msg: dict) -> float:
+    """
+    Attachment without text → the gif's length or IMAGE_DURATION; otherwise <20 chars → 1–1.5s, 20–50 chars → 2–2.5s,
+    >50 chars → 3–3.5s, system/bot → 1s; longer text sits at the top of its range.
+    """
+    length = len(msg.get("content", ""))
+    attachments = msg.get("attachments")
+    if attachments and not length:
+        return gif_duration(msg) if attachments[0].get("content_type") == "gif" else IMAGE_DURATION
+    if is_system(msg):
+        return 1.0
+    if length < 20:
+        return round(1.0 + 0.5 * length / 20, 2)
+    if length <= 50:
+        return round(2.0 + 0.5 * (length - 20) / 30, 2)
+    return round(3.0 + 0.5 * min(length - 50, 50) / 50, 2)
+
+
+def apply_rules(scenario: dict, sound_dir: str = SOUND_DIR) -> dict:
+    """Fill sound, animation and duration of every message deterministically."""
+    index = sound_index(sound_dir)
+    for msg in scenario.get("contents", []):
+        msg["sound"] = index.choose(msg.get("content", ""))
+        msg["animation"] = assign_animation(msg)
+        msg["duration"] = assign_duration(msg)
+    return scenario
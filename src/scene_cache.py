@@ -0,0 +1,169 @@
+"""
+Scene-level render cache (render_mode=cached).
+
+Every message is encoded as its own segment with round(duration * fps) frames sampled at j / fps
+from the start of the scene, so a segment depends only on the inputs hashed into its key:
+the message (minus its sound, which only goes into the audio), its chatter's avatar, the fonts,
+the layout constants, the title/watermark overlays (drawn into every segment) and the encoder
+profile. A re-render reuses every unchanged segment from disk, encodes only the changed ones,
+joins them with the concat demuxer and muxes audio mixed once over the whole timeline.
+"""
+import hashlib, json, os, tempfile, time
+import encoder
+import metrics
+import parallel_render
+import prefetch
+import shorts
+import stream_render
+import utils
+from compositor import FrameCompositor
+
+
+CACHE_DIR = "./cache/scenes"
+MAX_CACHE_BYTES = 4 * 1024**3
+VERSION = 1  # bump when scene rendering changes in a way the key can't see
+LAYOUT_CONSTANTS = (
+    "VIDEO_WIDTH", "VIDEO_HEIGHT", "FPS", "BG_COLOR", "SIDE_PADDING", "AVATAR_SIZE", "AVATAR_USER_GAP",
+    "USER_MSG_GAP", "ATTACHMENT_SIZE", "TITLE_Y", "WATERMARK_MARGIN", "TITLE_FONT_SIZE", "MESSAGE_FONT_SIZE",
+    "USERNAME_FONT_SIZE", "WATERMARK_FONT_SIZE", "GIF_MAX_DURATION", "GIF_OVERFLOW",
+)
+
+
+def font_id(path: str) -> str:
+    """Path plus size and mtime, so replacing a font file invalidates its scenes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path
+    return f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def scene_key(msg: dict, chatters: dict, fonts: dict, descriptions: dict, frames: int, profile: str) -> str:
+    inputs = {
+        "version": VERSION,
+        "message": {key: value for key, value in msg.items() if key != "sound"},
+        "avatar": chatters.get(msg.get("username"), {}).get("avatarURL"),
+        "fonts": {role: font_id(path) for role, path in fonts.items()},
+        "overlays": {key: descriptions.get(key) for key in ("title", "watermark")},
+        "layout": {name: getattr(shorts, name) for name in LAYOUT_CONSTANTS},
+        "frames": frames,
+        "encoder": [profile, encoder.PROFILES[profile], encoder.KEYFRAME_SECONDS],
+    }
+    return hashlib.sha256(json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def plan_frames(contents: list, fps: int = shorts.FPS) -> tuple:
+    """Frame count of every scene, and starts/total snapped to them so the audio lines up with the segments."""
+    counts = [max(1, round(shorts.message_duration(msg) * fps)) for msg in contents]
+    starts, elapsed = [], 0
+    for count in counts:
+        starts.append(elapsed / fps)
+        elapsed += count
+    return counts, starts, elapsed / fps
+
+
+class SceneCache:
+    """Encoded scene segments on disk, named by scene key and evicted least recently used first."""
+
+    def __init__(self, root: str = None, max_bytes: int = MAX_CACHE_BYTES):
+        root = root or CACHE_DIR
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def get(self, key: str) -> str:
+        """Path of the cached segment (marked as used), or None."""
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, key: str, render) -> str:
+        """Run render(tmp_path) and move its output into the cache atomically."""
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp.mp4"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def evict(self):
+        """Drop least recently used segments until the cache fits in max_bytes."""
+        entries = [entry for entry in os.scandir(self.root) if entry.name.endswith(".mp4") and ".tmp" not in entry.name]
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def render_scene(msg: dict, index: int, chatters: dict, message_font: str, overlays: list, frames: int, output_path: str, profile: str):
+    """Encode one message's segment without audio."""
+    compositor = FrameCompositor([], (shorts.VIDEO_WIDTH, shorts.VIDEO_HEIGHT), shorts.BG_COLOR, overlays)
+    scene = shorts.create_message_scene(msg, chatters, message_font)
+    try:
+        stream_render.pipe_frames((compositor.render(index, scene, j / shorts.FPS) for j in range(frames)), output_path, shorts.FPS, profile=profile)
+    finally:
+        compositor.release()
+        scene.close()
+
+
+@utils.debug_print
+def render_cached(
+    scenario: dict,
+    title_font: str = shorts.DEFAULT_FONT,
+    message_font: str = shorts.DEFAULT_FONT,
+    watermark_font: str = shorts.DEFAULT_FONT,
+    filename: str = "output",
+    profile: str = encoder.DEFAULT_PROFILE,
+    cache: SceneCache = None,
+):
+    """Render a scenario reusing the encoded segments of every message whose inputs did not change."""
+    contents = scenario.get("contents", [])
+    if not contents:
+        print("No messages to generate.")
+        return
+
+    cache = cache or SceneCache()
+    prefetch.prefetch_assets(scenario, shorts.AVATAR_SIZE, shorts.ATTACHMENT_SIZE, report=False)
+    chatters = scenario.get("chatters", {})
+    descriptions = scenario.get("descriptions", {})
+    fonts = {"title_font": title_font, "message_font": message_font, "watermark_font": watermark_font}
+    counts, starts, total = plan_frames(contents)
+    overlays = shorts.create_overlays(descriptions, title_font, watermark_font)
+
+    output_dir = "./output"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{filename}.mp4")
+    started = time.perf_counter()
+    segment_paths, reused = [], 0
+    for index, msg in enumerate(contents):
+        key = scene_key(msg, chatters, fonts, descriptions, counts[index], profile)
+        path = cache.get(key)
+        if path is None:
+            metrics.tracer.count("scene_cache.miss")
+            path = cache.put(key, lambda tmp_path: render_scene(msg, index, chatters, message_font, overlays, counts[index], tmp_path, profile))
+        else:
+            metrics.tracer.count("scene_cache.hit")
+            reused += 1
+        segment_paths.append(path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_path = os.path.join(tmp_dir, "audio.wav")
+        stream_render.write_audio_track(scenario, starts, total, audio_path)
+        parallel_render.concat_segments(segment_paths, audio_path, output_path, total, profile)
+    cache.evict()
+
+    print(f"✅ Video generated successfully: {output_path} ({reused}/{len(contents)} scenes reused, {time.perf_counter() - started:.1f}s)")
+    return output_path
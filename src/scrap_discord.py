@@ -2,22 +2,11 @@ import requests
 import datetime as dt
 import json
 import os.path
+import time
+import metrics
 import utils
-
-
-# wrapper class for recognition
-class ChatRawData:
-    def __init__(self, rawdata):
-        try:
-            self.chatters: dict = rawdata["chatters"]
-            self.contents: dict = rawdata["contents"]
-        except Exception as err:
-            print(f"Error initializing ChatRawData: {err}")
-            self.chatters: dict = {}
-            self.contents: dict = {}
-
-    def get_data(self):
-        return {"chatters": self.chatters, "contents": self.contents}
+from chat_data import ChatRawData
+from message_store import MessageStore
 
 
 def datetime_to_snowflake(dt: dt.datetime) -> int:
@@ -26,82 +15,119 @@ def datetime_to_snowflake(dt: dt.datetime) -> int:
     return (timestamp_ms - discord_epoch) << 22
 
 
-@utils.debug_print
-def extract_chat(
-    token: str,
-    channel_id: str,
-    filename: str,
-    timezone: dt.timezone,
-    before: dt.datetime = dt.datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999),
-    after: dt.datetime = (dt.datetime.now() - dt.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
-    save: bool = False,
-) -> ChatRawData:
-    headers = {
+# overridable so benchmarks can point the scraper at a local stand-in (see standin.py)
+DISCORD_API = os.getenv("DISCORD_API") or "https://discord.com/api/v9"
+DISCORD_CDN = os.getenv("DISCORD_CDN") or "https://cdn.discordapp.com"
+PAGE_LIMIT = 100
+MAX_RATE_LIMIT_RETRIES = 5
+USER_MESSAGE_TYPES = (0, 19)  # DEFAULT and REPLY; every other type is generated by Discord
+
+
+def make_headers(token: str) -> dict:
+    return {
         "Authorization": token,
         "Content-Type": "application/json",
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.6167.139 Safari/537.36",
     }
 
-    chatters_r = set()
-    chatters = {}
-    contents = []
 
-    # 'before' 시간을 기준으로 탐색을 시작합니다.
-    before_snowflake = datetime_to_snowflake(before)
-    after_utc = after.astimezone(dt.timezone.utc)
+def message_to_content(msg: dict, timezone: dt.timezone) -> tuple:
+    """
+    (chatter_sector, content_sector) of a raw Discord message; the content keeps its aware datetime under "time"
+    and "system" is set for bot authors and non-default message types (joins, pins, boosts, ...).
+    """
+    name = msg["author"]["username"] if msg["author"]["global_name"] is None else msg["author"]["global_name"]
+    avatar = f'{DISCORD_CDN}/avatars/{msg["author"]["id"]}/{msg["author"]["avatar"]}.png?size=128'
+    content = msg["content"]
+    time = dt.datetime.fromisoformat(msg["timestamp"]).astimezone(timezone)
+    attachments = list(map(utils.attachment_align, msg["attachments"]))
+    system = bool(msg["author"].get("bot")) or msg.get("type", 0) not in USER_MESSAGE_TYPES
+    return (name, avatar), {"name": name, "content": content, "time": time, "attachments": attachments, "system": system}
 
-    url = f"https://discord.com/api/v9/channels/{channel_id}/messages?before={before_snowflake}&limit=100"
-    
-    while True:
-        res = requests.get(url, headers=headers)
-        if res.status_code != 200:
-            print(f"Error {res.status_code} while fetching messages between {after} and {before}")
-            return ChatRawData({"chatters": {}, "contents": []})
 
-        chat_data = json.loads(res.content.decode("utf-8"))
+def build_chat_data(messages, filename: str = "", save: bool = False) -> ChatRawData:
+    """Build ChatRawData from raw messages ordered oldest first; with save, also write ./chats/{filename}.ndjson."""
+    chat_data = ChatRawData()
+    for (name, avatar), content_sector in messages:
+        chat_data.append(name, avatar, content_sector["content"], content_sector["time"], content_sector["attachments"], system=content_sector.get("system", False))
+
+    if save:
+        chat_data.write_ndjson(f"./chats/{filename}.ndjson")
+
+    return chat_data
+
+
+def fetch_page(session: requests.Session, channel_id: str, before: int) -> list:
+    """One page of messages older than `before`; waits out 429s using Retry-After. None on other errors."""
+    url = f"{DISCORD_API}/channels/{channel_id}/messages?before={before}&limit={PAGE_LIMIT}"
+    for _ in range(MAX_RATE_LIMIT_RETRIES):
+        res = session.get(url)
+        metrics.tracer.count("discord.requests")
+        if res.status_code == 429:
+            retry_after = float(res.headers.get("Retry-After") or res.json().get("retry_after", 1))
+            print(f"⚠️ Rate limited on channel {channel_id}, retrying in {retry_after}s")
+            time.sleep(retry_after)
+            continue
+        if res.status_code != 200:
+            print(f"Error {res.status_code} while fetching messages before {before}")
+            return None
+        return json.loads(res.content.decode("utf-8"))
+    return None
+
+
+def store_page(store: MessageStore, page: list, lo: int, cursor: int) -> int:
+    """Store a page fetched before cursor with the range it covers; returns the next cursor (lo once the gap is done)."""
+    # 더 이상 불러올 메시지가 없으면 채널의 시작까지 모두 받은 것입니다.
+    if not page:
+        store.add_page([], lo, cursor)
+        return lo
+    oldest = min(int(msg["id"]) for msg in page)
+    page_lo = lo if len(page) < PAGE_LIMIT else max(oldest, lo)
+    store.add_page(page, page_lo, cursor)
+    return page_lo
+
+
+def fill_gap(session: requests.Session, store: MessageStore, channel_id: str, lo: int, hi: int) -> bool:
+    """
+    Page backwards from hi until lo, storing each page and the range it covers as it arrives.
+    Returns False if the gap could not be completed (it is resumed from the last stored page next time).
+    """
+    cursor = hi
+    while cursor > lo:
+        page = fetch_page(session, channel_id, cursor)
+        if page is None:
+            return False
+        cursor = store_page(store, page, lo, cursor)
+    return True
 
-        # 더 이상 불러올 메시지가 없으면 루프를 종료합니다.
-        if not chat_data:
-            break
 
-        for msg in chat_data:
-            msg_timestamp = dt.datetime.fromisoformat(msg["timestamp"]).astimezone(dt.timezone.utc)
-            
-            # after 시간보다 오래된 메시지를 찾으면 탐색을 멈춥니다.
-            if msg_timestamp < after_utc:
+@utils.debug_print
+def extract_chat(
+    token: str,
+    channel_id: str,
+    filename: str,
+    timezone: dt.timezone,
+    before: dt.datetime = dt.datetime.now().replace(hour=23, minute=59, second=59, microsecond=999999),
+    after: dt.datetime = (dt.datetime.now() - dt.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0),
+    save: bool = False,
+) -> ChatRawData:
+    """
+    Export messages between after and before.
+    Messages are kept in a per-channel MessageStore, so only ranges that were never fetched are requested.
+    """
+    store = MessageStore(channel_id)
+    after_snowflake = datetime_to_snowflake(after)
+    # 미래 구간은 아직 메시지가 없으므로 현재 시각까지만 받은 것으로 기록합니다.
+    before_snowflake = min(datetime_to_snowflake(before), datetime_to_snowflake(dt.datetime.now(dt.timezone.utc)))
+
+    with metrics.tracer.span("scrape", channel_id=channel_id), requests.Session() as session:
+        session.headers.update(make_headers(token))
+        for gap_lo, gap_hi in store.gaps(after_snowflake, before_snowflake):
+            if not fill_gap(session, store, channel_id, gap_lo, gap_hi):
+                print(f"⚠️ Export between {after} and {before} is incomplete; the next run resumes from the last stored page")
                 break
-                
-            name = msg["author"]["username"] if msg["author"]["global_name"] is None else msg["author"]["global_name"]
-            avatar = f'https://cdn.discordapp.com/avatars/{msg["author"]["id"]}/{msg["author"]["avatar"]}.png?size=128'
-            content = msg["content"]
-            timestamp = utils.format_datetime(dt.datetime.fromisoformat(msg["timestamp"]).astimezone(timezone))
-            attachments = list(map(utils.attachment_align, msg["attachments"]))
-            chatter_sector = (name, avatar)
-            content_sector = {"name": name, "content": content, "timestamp": timestamp, "attachments": attachments}
-            chatters_r.add(chatter_sector)
-            contents.append(content_sector)
-
-        # 'after' 시간보다 오래된 메시지를 찾았으면 외부 루프를 종료합니다.
-        if msg_timestamp < after_utc:
-            break
-
-        # 다음 요청을 위해 현재 묶음에서 가장 오래된 메시지의 ID를 사용합니다.
-        last_msg_id = chat_data[-1]["id"]
-        url = f"https://discord.com/api/v9/channels/{channel_id}/messages?before={last_msg_id}&limit=100"
-
-
-    for chatter in chatters_r:
-        chatters[chatter[0]] = {"name": chatter[0], "avatar": chatter[1]}
-    contents.reverse()
-    extracted_data = {"chatters": chatters, "contents": contents}
 
-    if save:
-        file_src = f"./chats/{filename}.json"
-        if os.path.isfile(file_src):
-            os.remove(file_src)
-        if not os.path.exists(file_src):
-              os.makedirs(os.path.dirname("./chats/"), exist_ok=True)
-        with open(file_src, "+w", encoding="utf-8") as f:
-            f.write(json.dumps(extracted_data, indent=2,ensure_ascii=False))
-
-    return ChatRawData(extracted_data)
\ No newline at end of file
+    messages = (message_to_content(msg, timezone) for msg in store.messages_between(after_snowflake, datetime_to_snowflake(before)))
+    chat_data = build_chat_data(messages, filename, save)
+    store.close()
+    return chat_data
@@ -0,0 +1,340 @@
+"""
+Local render service: the batch runner's warm workers behind an HTTP API, with a priority queue.
+
+  POST /jobs               submit a job: {"scenario": {...}} or scrape parameters (channel_id/channel_ids,
+                           after, before), plus optional priority (higher runs first), filename,
+                           render_mode, encoder_profile and fonts; answers 202 with the job id
+  GET  /jobs               every known job and its status
+  GET  /jobs/<id>          status, progress, outputs and timings of one job
+  GET  /jobs/<id>/events   NDJSON stream of the job's state, one line per change, until it finishes
+  GET  /metrics            queue depth, running jobs, outcomes and wait/run latency percentiles
+
+Workers load fonts and sounds once and share the on-disk asset, LLM and scene caches, so a job only
+pays for what is new in it. Render progress comes from proglog bars (moviepy's, and the frame_index
+bar of the streaming renderers) forwarded by each worker.
+
+  python src/service.py --workers 2
+  python src/service.py --offline     # Discord, OpenRouter and the CDNs served by the local stand-in
+"""
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import argparse, datetime as dt, functools, heapq, itertools, json, os, queue, re, signal, sys, threading, time, uuid
+import proglog
+import batch
+import encoder
+import metrics
+
+
+SCENARIO_DIR = "./service/scenarios"
+POLL_INTERVAL = 0.2  # seconds the dispatch loop waits for worker events
+PROGRESS_INTERVAL = 0.5  # minimum seconds between progress events of one bar
+HEARTBEAT = 15.0  # seconds between event lines while a job's state does not change
+LATENCY_WINDOW = 200  # finished jobs the latency percentiles are computed over
+MAX_FINISHED = 1000  # finished jobs kept for GET /jobs/<id>
+RENDER_MODES = ("moviepy", "stream", "cached", "preview")  # no "parallel": workers are daemonic, see batch.job_config
+JOB_KEYS = (
+    "channel_id", "channel_ids", "after", "before", "filename", "render_mode", "encoder_profile",
+    "title_font", "message_font", "watermark_font",
+)
+TERMINAL = ("ok", "failed", "crashed")
+JOB_ROUTE = re.compile(r"^/jobs/([0-9a-f]+)(/events)?$")
+
+
+class ProgressLogger(proglog.ProgressBarLogger):
+    """Forwards the current job's bar updates to the service, throttled per bar."""
+
+    def __init__(self, worker_id: int, job_id: str, events):
+        super().__init__(min_time_interval=PROGRESS_INTERVAL)
+        self.worker_id = worker_id
+        self.job_id = job_id
+        self.events = events
+        self.sent = {}  # bar -> time of the last event
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if attr != "index":
+            return
+        total = self.bars[bar]["total"]
+        now = time.perf_counter()
+        if now - self.sent.get(bar, 0.0) < PROGRESS_INTERVAL and value != total:
+            return
+        self.sent[bar] = now
+        self.events.put((self.worker_id, {"id": self.job_id, "progress": {"bar": bar, "index": value, "total": total}}))
+
+
+def parse_job(body: dict) -> dict:
+    """Job spec for batch.job_config from a request body; raises ValueError on a malformed one."""
+    if not isinstance(body, dict):
+        raise ValueError("body is not an object")
+    job = {key: body[key] for key in JOB_KEYS if key in body}
+    if isinstance(body.get("scenario"), dict):
+        job["scenario"] = body["scenario"]
+    elif not (job.get("channel_id") or job.get("channel_ids")) or not job.get("after") or not job.get("before"):
+        raise ValueError('expected "scenario", or "channel_id"/"channel_ids" with "after" and "before"')
+    if not isinstance(body.get("priority", 0), int):
+        raise ValueError('"priority" is not an integer')
+    job["priority"] = body.get("priority", 0)
+    if job.get("render_mode", "stream") not in RENDER_MODES:
+        raise ValueError(f'unknown render_mode "{job["render_mode"]}"')
+    if job.get("encoder_profile", encoder.DEFAULT_PROFILE) not in encoder.PROFILES:
+        raise ValueError(f'unknown encoder_profile "{job["encoder_profile"]}"')
+    return job
+
+
+def latency_summary(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"count": len(ordered), "p50": percentile(0.5), "p95": percentile(0.95), "max": round(ordered[-1], 3)}
+
+
+class RenderService(batch.BatchRunner):
+    """
+    BatchRunner with a priority queue and per-job state for the HTTP handlers.
+    The runner itself is driven by run() on one thread; handlers only touch `states` (under `changed`)
+    and hand new jobs over through `intake`.
+    """
+
+    target = staticmethod(functools.partial(batch.worker_main, logger=ProgressLogger))  # reports progress
+
+    def __init__(self, workers: int, results_path: str, defaults: dict):
+        self.changed = threading.Condition()
+        self.states = {}  # job id -> state, see submit_request
+        self.finished = deque()  # ids of finished jobs, oldest first
+        self.waits = deque(maxlen=LATENCY_WINDOW)
+        self.runs = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = Counter()
+        self.intake = queue.Queue()
+        self.order = itertools.count()  # FIFO among equal priorities
+        super().__init__(workers, results_path, defaults)
+        self.backlog = []  # heap of (-priority, order, job)
+
+    # --- called from HTTP handler threads ---
+    def submit_request(self, body: dict) -> dict:
+        job = parse_job(body)
+        job["id"] = uuid.uuid4().hex[:12]
+        job.setdefault("filename", f"service_{job['id']}")
+        scenario = job.pop("scenario", None)
+        if scenario is not None:
+            os.makedirs(SCENARIO_DIR, exist_ok=True)
+            job["scenario_src"] = os.path.join(SCENARIO_DIR, f"{job['id']}.json")
+            with open(job["scenario_src"], "w", encoding="utf-8") as f:
+                json.dump(scenario, f, ensure_ascii=False)
+        with self.changed:
+            self.states[job["id"]] = {
+                "id": job["id"], "status": "queued", "priority": job["priority"], "attempt": 1,
+                "submitted": time.time(), "started": None, "finished": None,
+                "progress": {}, "outputs": [], "error": None, "timings": {}, "version": 0,
+            }
+        metrics.tracer.count("service.submitted")
+        self.intake.put(job)
+        return self.state(job["id"])
+
+    def state(self, job_id: str) -> dict:
+        with self.changed:
+            state = self.states.get(job_id)
+            return None if state is None else json.loads(json.dumps(state))
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float = HEARTBEAT) -> dict:
+        """State of the job once its version differs from version (or after timeout)."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.states.get(job_id, {}).get("version") != version, timeout)
+        return self.state(job_id)
+
+    def queue_metrics(self) -> dict:
+        with self.changed:
+            queued = [state for state in self.states.values() if state["status"] == "queued"]
+            now = time.time()
+            return {
+                "queue_depth": len(queued),
+                "queue_depth_by_priority": dict(Counter(state["priority"] for state in queued)),
+                "oldest_queued_seconds": round(max((now - state["submitted"] for state in queued), default=0.0), 3),
+                "running": sum(state["status"] == "running" for state in self.states.values()),
+                "workers": len(self.workers),
+                "outcomes": dict(self.outcomes),
+                "wait_seconds": latency_summary(self.waits),
+                "run_seconds": latency_summary(self.runs),
+                "counters": dict(metrics.tracer.counters),
+            }
+
+    # --- runner thread ---
+    def _update(self, job_id: str, **fields):
+        with self.changed:
+            state = self.states.get(job_id)
+            if state is None or state["status"] in TERMINAL:
+                return
+            state.update(fields)
+            state["version"] += 1
+            self.changed.notify_all()
+
+    def submit(self, job: dict):
+        job = {**job, "attempt": job.get("attempt", 1)}
+        self.outstanding += 1
+        heapq.heappush(self.backlog, (-job["priority"], next(self.order), job))
+        self._update(job["id"], status="queued", attempt=job["attempt"])
+        self._dispatch()
+
+    def _dispatch(self):
+        for worker_id, (process, jobs) in self.workers.items():
+            if not self.backlog:
+                return
+            if worker_id not in self.running and process.is_alive():
+                _, _, job = heapq.heappop(self.backlog)
+                self.running[worker_id] = job
+                self._update(job["id"], status="running", started=time.time(), progress={})
+                jobs.put(job)
+
+    def _event(self, worker_id: int, record: dict):
+        if "progress" not in record:
+            return super()._event(worker_id, record)
+        with self.changed:
+            state = self.states.get(record["id"])
+            progress = {**state["progress"], record["progress"]["bar"]: record["progress"]} if state else {}
+        self._update(record["id"], progress=progress)
+
+    def _record(self, record: dict):
+        super()._record(record)
+        fields = {"outputs": record["outputs"], "error": record.get("error"), "timings": {**record["timings"], "stages": record.get("stages", {})}}
+        if record["status"] != "ok" and record["attempt"] < batch.MAX_ATTEMPTS:
+            self._update(record["id"], **fields)  # submit() re-queues it next
+            return
+        with self.changed:
+            state = self.states[record["id"]]
+            state.update(fields, status=record["status"], finished=time.time())
+            state["version"] += 1
+            self.waits.append(state["started"] - state["submitted"])
+            self.runs.append(state["finished"] - state["started"])
+            self.outcomes[record["status"]] += 1
+            self.finished.append(record["id"])
+            while len(self.finished) > MAX_FINISHED:
+                self.states.pop(self.finished.popleft(), None)
+            self.changed.notify_all()
+
+    def run(self):
+        """Dispatch loop: take in submitted jobs, handle worker events, replace dead workers."""
+        while True:
+            while True:
+                try:
+                    self.submit(self.intake.get_nowait())
+                except queue.Empty:
+                    break
+            self.poll(timeout=POLL_INTERVAL)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, value, status: int = 200):
+        self.send(status, json.dumps(value, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def send_events(self, service: RenderService, state: dict):
+        """Close-delimited NDJSON: the current state, then every change until the job finishes."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while state is not None:
+                self.wfile.write((json.dumps(state, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                if state["status"] in TERMINAL:
+                    break
+                state = service.wait_for_change(state["id"], state["version"])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            return self.send_json(service.queue_metrics())
+        if path == "/jobs":
+            with service.changed:
+                jobs = [{key: state[key] for key in ("id", "status", "priority", "submitted")} for state in service.states.values()]
+            return self.send_json(jobs)
+        match = JOB_ROUTE.match(path)
+        state = service.state(match.group(1)) if match else None
+        if state is None:
+            return self.send_json({"error": "not found"}, 404)
+        if match.group(2):
+            return self.send_events(service, state)
+        self.send_json(state)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            return self.send_json({"error": "not found"}, 404)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            state = self.server.service.submit_request(body)
+        except ValueError as e:  # includes JSONDecodeError
+            return self.send_json({"error": str(e)}, 400)
+        self.send_json(state, 202)
+
+
+def start_offline():
+    """Start the stand-in with the benchmark cases as channels and point every client at it."""
+    import benchmark
+    import standin
+
+    server = standin.StandIn().start()
+    server.channels.update({
+        benchmark.channel_id(name): sorted(benchmark.synthetic_messages(spec, server.url), key=lambda msg: -int(msg["id"]))
+        for name, spec in benchmark.CASES.items()
+    })
+    os.environ.update(server.env())
+    os.environ["TOKEN"] = "standin"
+    # a day either side, so the window holds whatever local timezone main.parse_datetime assumes
+    after, before = benchmark.BASE_TIME - dt.timedelta(days=1), benchmark.BASE_TIME + dt.timedelta(days=1)
+    print(f"🔌 Offline: stand-in at {server.url}; channels {', '.join(benchmark.channel_id(name) for name in benchmark.CASES)}")
+    print(f"   with messages between after={after.year}_{after.month}_{after.day}_0_0 and before={before.year}_{before.month}_{before.day}_23_59")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render shorts submitted over HTTP on a pool of warm workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--results", default="./output/service_results.jsonl")
+    parser.add_argument("--offline", action="store_true", help="serve Discord, OpenRouter and the CDNs from the local stand-in")
+    args = parser.parse_args()
+
+    # before the workers are spawned, so they inherit the stand-in environment
+    offline = start_offline() if args.offline else None
+
+    import main as cli
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    service = RenderService(args.workers, args.results, cli.load_config())
+    server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🚀 Render service on http://{args.host}:{server.server_port} with {args.workers} workers")
+    # SIGTERM shuts down like Ctrl+C, so the workers are stopped instead of orphaned
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        service.close()
+        if offline is not None:
+            offline.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,202 +1,232 @@
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageOps
-import numpy as np
 from moviepy import *
-import re, tempfile, os, requests
+import numpy as np
+import os
+import time
+import asset_cache
+import encoder
+import metrics
+import sound_bank
+import prefetch
+from animated_source import AnimatedClip, scene_duration
+from compositor import Scene, FrameCompositor
+from text_render import text_clip
+
+
+# --- 1. Video settings ---
+VIDEO_WIDTH, VIDEO_HEIGHT = 1080, 1920
+FPS = 30
+BG_COLOR = (22, 23, 27)
+
+# Layout settings
+SIDE_PADDING = 100
+AVATAR_SIZE = 250
+AVATAR_USER_GAP, USER_MSG_GAP = 30, 20
+ATTACHMENT_SIZE = 800
+TITLE_Y, WATERMARK_MARGIN = 150, 150
+
+# Animated attachments: "trim" plays them once up to GIF_MAX_DURATION, "loop" repeats them for exactly GIF_MAX_DURATION
+GIF_MAX_DURATION = 6.0
+GIF_OVERFLOW = "trim"
+
+# Font sizes
+TITLE_FONT_SIZE, MESSAGE_FONT_SIZE = 70, 60
+USERNAME_FONT_SIZE, WATERMARK_FONT_SIZE = 50, 40
+
+DEFAULT_SOUND_PATH = "./asset/sounds/discord-notification.mp3"
+DEFAULT_FONT = "./asset/fonts/Orbit-Regular.ttf"
+
+
+class Layout:
+    """
+    Sizes and positions of the video, scaled from the settings above.
+    Layout() is the full 1080x1920 render; previews use a smaller scale and fps.
+    """
+
+    def __init__(self, scale: float = 1.0, fps: int = FPS):
+        def scaled(value: int) -> int:
+            return max(1, round(value * scale))
+
+        self.scale, self.fps = scale, fps
+        # x264 with yuv420p needs even dimensions
+        self.width, self.height = scaled(VIDEO_WIDTH) // 2 * 2, scaled(VIDEO_HEIGHT) // 2 * 2
+        self.side_padding = scaled(SIDE_PADDING)
+        self.avatar_size = scaled(AVATAR_SIZE)
+        self.avatar_user_gap, self.user_msg_gap = scaled(AVATAR_USER_GAP), scaled(USER_MSG_GAP)
+        self.attachment_size = scaled(ATTACHMENT_SIZE)
+        self.title_y, self.watermark_margin = scaled(TITLE_Y), scaled(WATERMARK_MARGIN)
+        self.title_font_size, self.message_font_size = scaled(TITLE_FONT_SIZE), scaled(MESSAGE_FONT_SIZE)
+        self.username_font_size, self.watermark_font_size = scaled(USERNAME_FONT_SIZE), scaled(WATERMARK_FONT_SIZE)
+
+    @property
+    def size(self) -> tuple:
+        return self.width, self.height
+
+
+FULL_LAYOUT = Layout()
+
+
+# --- 2. Helper functions ---
+def make_circle_image(url: str, size: int = AVATAR_SIZE) -> ImageClip:
+    """Load a cached circle-masked avatar as ImageClip."""
+    try:
+        return ImageClip(asset_cache.load_avatar(url, size))
+    except Exception as e:
+        print(f"❌ Avatar image error: {url}, {e}")
+        return ColorClip(size=(size, size), color=(0, 0, 0, 0))
+
+
+def make_attachment_image(url: str, size: int = ATTACHMENT_SIZE) -> ImageClip:
+    """Load a cached, resized image attachment."""
+    try:
+        return ImageClip(asset_cache.load_attachment_image(url, size))
+    except Exception as e:
+        print(f"❌ Attachment image error: {url}, {e}")
+        return ColorClip(size=(size, size), color=(0, 0, 0, 0))
+
+
+def make_attachment_gif(url: str, size: int = ATTACHMENT_SIZE, fps: int = FPS) -> AnimatedClip:
+    """Lazily decoded gif/webp/mp4 attachment, sampled at the output fps and trimmed or looped to GIF_MAX_DURATION."""
+    try:
+        source = asset_cache.load_attachment_gif(url, size)
+        return AnimatedClip(source, scene_duration(source.duration, GIF_MAX_DURATION, GIF_OVERFLOW)).with_fps(fps)
+    except Exception as e:
+        print(f"❌ Attachment gif error: {url}, {e}")
+        raise e
+
+
+def centered(size: int, frame_size: int) -> int:
+    """Offset of a centered element, truncated the way moviepy positions clips."""
+    return int((frame_size - size) / 2)
+
+
+def message_duration(msg_data: dict) -> float:
+    """Scene length of a message without building it; gif messages last as long as the gif, within GIF_MAX_DURATION."""
+    attachments = msg_data.get("attachments")
+    if attachments and attachments[0]["content_type"] == "gif":
+        durations = asset_cache.load_animated(attachments[0]["url"])["durations"]
+        return scene_duration(float(durations.sum()), GIF_MAX_DURATION, GIF_OVERFLOW)
+    return msg_data.get("duration", 2)
+
+
+def create_message_audio(msg_data: dict, duration: float) -> np.ndarray:
+    """Sound effect samples of a message from the sound bank, sped up to fit the scene if it is longer."""
+    sound_path = msg_data.get("sound", DEFAULT_SOUND_PATH)
+    if not os.path.exists(sound_path):
+        print(f"⚠️ Warning: Sound file not found - {sound_path}")
+        return None
+    try:
+        return sound_bank.default_bank.fitted(sound_path, duration, target_db=-3.0)
+    except Exception as e:
+        print(f"❌ Sound error: {sound_path}, {e}")
+        return None
+
+
+def create_message_scene(msg_data: dict, chatters: dict, message_font: str = DEFAULT_FONT, layout: Layout = FULL_LAYOUT) -> Scene:
+    """Convert one message into a scene: static clips plus an optional animated gif."""
+    duration = msg_data.get("duration", 2)
+    username = msg_data["username"]
+    dynamic = None
+
+    # Avatar
+    avatar_url = chatters.get(username, {}).get("avatarURL")
+    avatar_clip = make_circle_image(avatar_url, layout.avatar_size) if avatar_url else ColorClip(
+        size=(layout.avatar_size, layout.avatar_size), color=(0, 0, 0, 0)
+    )
+
+    # Text
+    text_width = layout.width - layout.side_padding * 2
+    username_clip = text_clip(username, message_font, layout.username_font_size, "lightgray", (text_width, layout.username_font_size * 2))
+    content_clip = text_clip(msg_data["content"], message_font, layout.message_font_size, "white", (text_width, layout.message_font_size * 4))
+
+    # Vertical layout
+    total_height = avatar_clip.h + layout.avatar_user_gap + username_clip.h + layout.user_msg_gap + content_clip.h
+    start_y = (layout.height - total_height) / 2
+
+    avatar_y = start_y
+    username_y = avatar_y + avatar_clip.h + layout.avatar_user_gap
+    content_y = username_y + username_clip.h + layout.user_msg_gap
+
+    avatar_clip = avatar_clip.with_position(("center", avatar_y))
+    username_clip = username_clip.with_position(("center", username_y))
+    content_clip = content_clip.with_position(("center", content_y))
+
+    # Attachments
+    if bool(msg_data.get("attachments")):
+        attachment = msg_data["attachments"][0]
+        if attachment["content_type"] == "gif":
+            gif_clip = make_attachment_gif(attachment["url"], layout.attachment_size, layout.fps)
+            duration = gif_clip.duration
+            dynamic = (gif_clip, centered(gif_clip.w, layout.width), centered(gif_clip.h, layout.height))
+            content_clip = None
+        elif attachment["content_type"] == "image":
+            content_clip = make_attachment_image(attachment["url"], layout.attachment_size).with_position("center")
+
+    static_clips = [avatar_clip, username_clip] + ([content_clip] if content_clip is not None else [])
+
+    return Scene(duration, static_clips, dynamic)
+
+
+def create_overlays(descriptions: dict, title_font: str = DEFAULT_FONT, watermark_font: str = DEFAULT_FONT, layout: Layout = FULL_LAYOUT) -> list:
+    """Title and watermark clips as (clip, x, y), drawn on top of every frame."""
+    overlays = []
+    text_width = layout.width - layout.side_padding * 2
+    if descriptions.get("title"):
+        title_clip = text_clip(
+            descriptions["title"], title_font, layout.title_font_size, "white",
+            (text_width, layout.title_font_size * 2), align="left"
+        )
+        overlays.append((title_clip, centered(title_clip.w, layout.width), layout.title_y))
+    if descriptions.get("watermark"):
+        watermark_clip = text_clip(
+            descriptions["watermark"], watermark_font, layout.watermark_font_size, "gray",
+            (text_width, layout.watermark_font_size * 2), align="left"
+        )
+        overlays.append((watermark_clip, centered(watermark_clip.w, layout.width), layout.height - layout.watermark_margin))
+    return overlays
+
+
+def build_audio_track(contents: list, starts: list, durations: list, total: float) -> AudioArrayClip:
+    """Mix every message's sound effect onto one timeline buffer."""
+    placements = []
+    for msg, start, duration in zip(contents, starts, durations):
+        samples = create_message_audio(msg, duration)
+        if samples is not None:
+            placements.append((start, samples))
+    if not placements:
+        return None
+    return AudioArrayClip(sound_bank.default_bank.mix(placements, total), fps=sound_bank.SAMPLE_RATE)
 
 
 def generate_discord_chat_shorts(
     scenario: dict,
-    title_font: str = "./asset/fonts/Orbit-Regular.ttf",
-    message_font: str = "./asset/fonts/Orbit-Regular.ttf",
-    watermark_font: str = "./asset/fonts/Orbit-Regular.ttf",
+    title_font: str = DEFAULT_FONT,
+    message_font: str = DEFAULT_FONT,
+    watermark_font: str = DEFAULT_FONT,
     filename: str = "output",
+    profile: str = encoder.DEFAULT_PROFILE,
 ):
     """
     Generate a YouTube Shorts-style video that simulates Discord chat.
     """
-    # --- 1. Video settings ---
-    VIDEO_WIDTH, VIDEO_HEIGHT = 1080, 1920
-    FPS = 30
-    BG_COLOR = (22, 23, 27)
-
-    # Layout settings
-    SIDE_PADDING = 100
-    AVATAR_SIZE = 250
-    AVATAR_USER_GAP, USER_MSG_GAP = 30, 20
-    ATTACHMENT_SIZE = 800
-
-    # Font sizes
-    TITLE_FONT_SIZE, MESSAGE_FONT_SIZE = 70, 60
-    USERNAME_FONT_SIZE, WATERMARK_FONT_SIZE = 50, 40
-
-    DEFAULT_SOUND_PATH = "./asset/sounds/discord-notification.mp3"
-
-    # --- 2. Helper functions ---
-    def make_circle_image(url: str) -> ImageClip:
-        """Download image and mask it to a circle as ImageClip."""
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            img_data = BytesIO(response.content)
-            avatar_img = Image.open(img_data).convert("RGBA")
-            avatar_img = ImageOps.fit(avatar_img, (AVATAR_SIZE, AVATAR_SIZE), Image.Resampling.LANCZOS)
-
-            mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
-            draw = ImageDraw.Draw(mask)
-            draw.ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
-
-            avatar_img.putalpha(mask)
-            return ImageClip(np.array(avatar_img))
-        except Exception as e:
-            print(f"❌ Avatar image error: {url}, {e}")
-            return ColorClip(size=(AVATAR_SIZE, AVATAR_SIZE), color=(0, 0, 0, 0))
-
-    def normalize_audio(audio_clip: AudioClip, target_db=-1.0) -> AudioClip:
-        """Normalize audio clip to a target dB peak level."""
-        target_amplitude = 10 ** (target_db / 20.0)
-        current_max = audio_clip.max_volume()
-        if current_max == 0:
-            return audio_clip
-        factor = target_amplitude / current_max
-        return audio_clip.with_volume_scaled(factor)
-
-    def make_attachment_image(url: str) -> ImageClip:
-        """Download and resize an image attachment."""
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            img_data = BytesIO(response.content)
-            attachment_img = Image.open(img_data).convert("RGBA")
-            attachment_img.thumbnail((ATTACHMENT_SIZE, ATTACHMENT_SIZE), Image.Resampling.LANCZOS)
-            return ImageClip(np.array(attachment_img))
-        except Exception as e:
-            print(f"❌ Attachment image error: {url}, {e}")
-            return ColorClip(size=(ATTACHMENT_SIZE, ATTACHMENT_SIZE), color=(0, 0, 0, 0))
-
-    def make_attachment_gif(url: str) -> VideoFileClip:
-        """Download and convert a gif attachment into VideoFileClip."""
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-
-            # If tenor view link, extract raw gif
-            if url.startswith("https://tenor.com"):
-                matches = re.findall(r'https://media1\.tenor\.com/[^\s"\']+\.gif', response.text)
-                if not matches:
-                    raise Exception("GIF URL not found")
-                url = matches[0]
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".gif") as tmp:
-                tmp.write(requests.get(url).content)
-                tmp_path = tmp.name
-
-            clip = VideoFileClip(tmp_path)
-            os.remove(tmp_path)
-            clip = clip.resized(height=ATTACHMENT_SIZE, width=ATTACHMENT_SIZE)
-            return clip
-
-        except Exception as e:
-            print(f"❌ Attachment gif error: {url}, {e}")
-            raise e
-
-    def create_message_scene(msg_data: dict, chatters: dict) -> CompositeVideoClip:
-        """Convert one message into a video scene."""
-        duration = msg_data.get("duration", 2)
-        username = msg_data["username"]
-        scene_elements = []
-
-        # Avatar
-        avatar_url = chatters.get(username, {}).get("avatarURL")
-        avatar_clip = make_circle_image(avatar_url) if avatar_url else ColorClip(
-            size=(AVATAR_SIZE, AVATAR_SIZE), color=(0, 0, 0, 0)
-        )
-
-        # Text
-        text_width = VIDEO_WIDTH - SIDE_PADDING * 2
-        username_clip = TextClip(
-            text=username,
-            font_size=USERNAME_FONT_SIZE, font=message_font, color="lightgray",
-            size=(text_width, USERNAME_FONT_SIZE * 2), method="caption", text_align="center"
-        )
-        content_clip = TextClip(
-            text=msg_data["content"],
-            font_size=MESSAGE_FONT_SIZE, font=message_font, color="white",
-            size=(text_width, MESSAGE_FONT_SIZE * 4), method="caption", text_align="center"
-        )
-
-        # Vertical layout
-        total_height = avatar_clip.h + AVATAR_USER_GAP + username_clip.h + USER_MSG_GAP + content_clip.h
-        start_y = (VIDEO_HEIGHT - total_height) / 2
-
-        avatar_y, username_y, content_y = start_y, start_y + avatar_clip.h + AVATAR_USER_GAP, start_y + avatar_clip.h + AVATAR_USER_GAP + username_clip.h + USER_MSG_GAP
-
-        avatar_clip = avatar_clip.with_duration(duration).with_position(("center", avatar_y))
-        username_clip = username_clip.with_duration(duration).with_position(("center", username_y))
-        content_clip = content_clip.with_duration(duration).with_position(("center", content_y))
-
-        # Attachments
-        try:
-            if bool(msg_data.get("attachments")):
-                attachment = msg_data["attachments"][0]
-                if attachment["content_type"] == "gif":
-                    content_clip = make_attachment_gif(attachment["url"])
-                    duration = content_clip.duration
-                elif attachment["content_type"] == "image":
-                    content_clip = make_attachment_image(attachment["url"])
-                content_clip = content_clip.with_position("center").with_duration(duration)
-        except Exception as e:
-            raise e
-
-        scene_elements.extend([avatar_clip, username_clip, content_clip])
-        scene = CompositeVideoClip(scene_elements, size=(VIDEO_WIDTH, VIDEO_HEIGHT))
-
-        # Audio
-        sound_path = msg_data.get("sound", DEFAULT_SOUND_PATH)
-        if os.path.exists(sound_path):
-            try:
-                audio = AudioFileClip(sound_path)
-                if audio.duration > duration:
-                    audio = audio.with_speed_scaled(duration / audio.duration, duration)
-                    audio = normalize_audio(audio, target_db=-3.0)
-                scene = scene.with_audio(audio)
-            except Exception as e:
-                print(f"❌ Sound error: {sound_path}, {e}")
-        else:
-            print(f"⚠️ Warning: Sound file not found - {sound_path}")
-
-        return scene
-
     # --- 3. Main logic ---
+    # Resolve every avatar/attachment concurrently before any scene is built
+    prefetch.prefetch_assets(scenario, AVATAR_SIZE, ATTACHMENT_SIZE)
+
     chatters_info = scenario.get("chatters", {})
-    message_clips = [create_message_scene(msg, chatters_info) for msg in scenario.get("contents", [])]
+    scenes = [create_message_scene(msg, chatters_info, message_font) for msg in scenario.get("contents", [])]
 
-    if not message_clips:
+    if not scenes:
         print("No messages to generate.")
         return
 
-    chat_sequence = concatenate_videoclips(message_clips, method="compose")
-    total_duration = chat_sequence.duration
-
-    overlays = []
-    descriptions = scenario.get("descriptions", {})
-    if descriptions.get("title"):
-        overlays.append(
-            TextClip(
-                text=descriptions["title"], font_size=TITLE_FONT_SIZE, font=title_font, color="white",
-                size=(VIDEO_WIDTH - SIDE_PADDING * 2, TITLE_FONT_SIZE * 2), method="caption"
-            ).with_duration(total_duration).with_position(("center", 150))
-        )
-    if descriptions.get("watermark"):
-        overlays.append(
-            TextClip(
-                text=descriptions["watermark"], font_size=WATERMARK_FONT_SIZE, font=watermark_font, color="gray",
-                size=(VIDEO_WIDTH - SIDE_PADDING * 2, WATERMARK_FONT_SIZE * 2), method="caption"
-            ).with_duration(total_duration).with_position(("center", VIDEO_HEIGHT - 150))
-        )
-
-    background = ColorClip(size=(VIDEO_WIDTH, VIDEO_HEIGHT), color=BG_COLOR).with_duration(total_duration)
-    final_video = CompositeVideoClip([background, chat_sequence] + overlays).with_fps(FPS)
+    overlays = create_overlays(scenario.get("descriptions", {}), title_font, watermark_font)
+    compositor = FrameCompositor(scenes, (VIDEO_WIDTH, VIDEO_HEIGHT), BG_COLOR, overlays)
+    final_video = VideoClip(frame_function=compositor.frame, duration=compositor.duration).with_fps(FPS)
+    contents = scenario.get("contents", [])
+    with metrics.tracer.span("audio"):
+        audio = build_audio_track(contents, compositor.starts, [scene.duration for scene in scenes], compositor.duration)
+    if audio is not None:
+        final_video = final_video.with_audio(audio)
 
     # --- 4. Export ---
     try:
@@ -204,13 +234,21 @@ def generate_discord_chat_shorts(
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, f"{filename}.mp4")
 
-        final_video.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="libmp3lame",
-            threads=4,
-            preset="ultrafast",
-        )
+        compose_before = metrics.tracer.stage_totals().get("compose", 0.0)
+        started = time.perf_counter()
+        # two-pass profiles write a lossless intermediate first and run both passes from it
+        written_path = f"{output_path}.lossless.mp4" if encoder.is_two_pass(profile) else output_path
+        final_video.write_videofile(written_path, threads=4, logger=metrics.tracer.logger or "bar", **encoder.moviepy_args(profile, FPS))
+        # moviepy interleaves composing and encoding; what isn't composing is encoding
+        compose_during = metrics.tracer.stage_totals().get("compose", 0.0) - compose_before
+        frame_count = int(compositor.duration * FPS)
+        metrics.tracer.add("encode", time.perf_counter() - started - compose_during, frames=frame_count)
+        if written_path != output_path:
+            try:
+                encoder.two_pass(written_path, output_path, compositor.duration, FPS, profile)
+            finally:
+                os.remove(written_path)
+        metrics.tracer.count("frames_encoded", frame_count)
         print(f"✅ Video generated successfully: {output_path}")
     except Exception as e:
         print(f"❌ Video export error: {e}")
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from moviepy.config import FFMPEG_BINARY
+import subprocess, threading
+import numpy as np
+
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+MAX_FITTED_BYTES = 64 * 1024**2  # sped-up variants kept; ~190s of stereo float32
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file into float32 samples of shape (n, CHANNELS) at sample_rate."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-loglevel", "error", "-i", path, "-f", "f32le", "-ac", str(CHANNELS), "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, CHANNELS)
+
+
+def resample_length(samples: np.ndarray, length: int) -> np.ndarray:
+    """Speed samples up or down to exactly `length` frames (linear interpolation, pitch follows speed)."""
+    if length <= 0:
+        return np.zeros((0, samples.shape[1]), dtype=np.float32)
+    positions = np.linspace(0, len(samples) - 1, length)
+    source = np.arange(len(samples))
+    return np.stack([np.interp(positions, source, samples[:, c]) for c in range(samples.shape[1])], axis=1).astype(np.float32)
+
+
+class SoundBank:
+    """
+    Sound effects decoded once per process.
+    Every file is kept as float32 at the output sample rate with its peak precomputed, and the
+    sped-up/normalized variants are memoized per target duration in an LRU bounded by max_fitted_bytes,
+    since long-lived workers see ever new durations.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, max_fitted_bytes: int = MAX_FITTED_BYTES):
+        self.sample_rate = sample_rate
+        self.max_fitted_bytes = max_fitted_bytes
+        self._sounds = {}
+        self._fitted = OrderedDict()
+        self._fitted_bytes = 0
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> tuple:
+        """(samples, peak) of a sound file, decoding it on first use."""
+        with self._lock:
+            if path in self._sounds:
+                return self._sounds[path]
+        samples = decode_audio(path, self.sample_rate)
+        samples.flags.writeable = False
+        sound = (samples, float(np.abs(samples).max()) if len(samples) else 0.0)
+        with self._lock:
+            return self._sounds.setdefault(path, sound)
+
+    def fitted(self, path: str, duration: float, target_db: float = -3.0) -> np.ndarray:
+        """
+        Samples of path for a scene of `duration` seconds.
+        Sounds longer than the scene are sped up to fit and normalized to target_db peak; shorter ones play as is.
+        """
+        samples, peak = self.load(path)
+        length = round(duration * self.sample_rate)
+        if len(samples) <= length:
+            return samples
+        key = (path, length, target_db)
+        with self._lock:
+            if key in self._fitted:
+                self._fitted.move_to_end(key)
+                return self._fitted[key]
+        samples = resample_length(samples, length)
+        if peak > 0:
+            samples *= 10 ** (target_db / 20.0) / peak
+        samples.flags.writeable = False
+        with self._lock:
+            if key not in self._fitted:
+                self._fitted[key] = samples
+                self._fitted_bytes += samples.nbytes
+            self._fitted.move_to_end(key)
+            while len(self._fitted) > 1 and self._fitted_bytes > self.max_fitted_bytes:
+                _, evicted = self._fitted.popitem(last=False)
+                self._fitted_bytes -= evicted.nbytes
+            return self._fitted[key]
+
+    def mix(self, placements: list, total: float) -> np.ndarray:
+        """Mix (start_seconds, samples) pairs onto one timeline buffer of `total` seconds."""
+        timeline = np.zeros((round(total * self.sample_rate), CHANNELS), dtype=np.float32)
+        for start, samples in placements:
+            offset = round(start * self.sample_rate)
+            length = min(len(samples), len(timeline) - offset)
+            if length > 0:
+                timeline[offset : offset + length] += samples[:length]
+        np.clip(timeline, -1, 1, out=timeline)
+        return timeline
+
+
+default_bank = SoundBank()
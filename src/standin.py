@@ -0,0 +1,219 @@
+"""
+Local HTTP stand-in for the Discord API, OpenRouter and the asset CDNs, so benchmarks run offline
+and every run sees the same bytes.
+
+  GET  /api/v9/channels/<id>/messages?before=&limit=   pages of the channel's synthetic messages, newest first
+  POST /openrouter/chat/completions                    a completion that turns the chat window into a scenario
+  GET  /avatars/<user>/<hash>.png                      generated avatar
+  GET  /images/<n>.png, /gifs/<n>.gif                  generated attachments
+
+Assets are generated deterministically from their path and kept in memory after the first request.
+"""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import ast, io, json, re, threading, time, zlib
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+AVATAR_SIZE = 128
+IMAGE_SIZE = (1280, 960)
+GIF_SIZE = 320
+GIF_FRAMES = 24
+GIF_FRAME_MS = 80
+
+
+def seeded(path: str) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(path.encode("utf-8")))
+
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, format=fmt, **options)
+    return output.getvalue()
+
+
+def make_avatar(path: str) -> bytes:
+    color = tuple(int(c) for c in seeded(path).integers(40, 230, 3))
+    image = Image.new("RGB", (AVATAR_SIZE, AVATAR_SIZE), color)
+    ImageDraw.Draw(image).ellipse((32, 24, 96, 88), fill=(240, 240, 240))
+    return encode(image, "PNG")
+
+
+def make_image(path: str) -> bytes:
+    """Gradient with noise, so it compresses about as badly as a photo."""
+    rng = seeded(path)
+    width, height = IMAGE_SIZE
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    tint = rng.uniform(0.3, 1.0, 3).astype(np.float32)
+    pixels = (x * tint + y * (1 - tint)) * 200 + rng.integers(0, 56, (height, width, 3))
+    return encode(Image.fromarray(pixels.astype(np.uint8)), "PNG")
+
+
+def make_gif(path: str) -> bytes:
+    """A ball bouncing across a colored background."""
+    rng = seeded(path)
+    background = tuple(int(c) for c in rng.integers(40, 200, 3))
+    frames = []
+    for i in range(GIF_FRAMES):
+        frame = Image.new("RGB", (GIF_SIZE, GIF_SIZE), background)
+        x = int((GIF_SIZE - 80) * abs(np.sin(np.pi * i / GIF_FRAMES)))
+        ImageDraw.Draw(frame).ellipse((x, 120, x + 80, 200), fill=(255, 220, 0))
+        frames.append(frame)
+    output = io.BytesIO()
+    frames[0].save(output, format="GIF", save_all=True, append_images=frames[1:], duration=GIF_FRAME_MS, loop=0)
+    return output.getvalue()
+
+
+ASSET_ROUTES = [
+    (re.compile(r"^/avatars/[^/]+/[^/]+\.png$"), "image/png", make_avatar),
+    (re.compile(r"^/images/[^/]+\.png$"), "image/png", make_image),
+    (re.compile(r"^/gifs/[^/]+\.gif$"), "image/gif", make_gif),
+]
+MESSAGES_ROUTE = re.compile(r"^/api/v9/channels/([^/]+)/messages$")
+COMPLETIONS_ROUTE = "/openrouter/chat/completions"
+
+
+def scenario_from_window(window: dict) -> dict:
+    """
+    What the scenario prompt asks the model for: chatters with avatarURL, messages renamed to username,
+    text and attachment split into separate messages, attachment types reduced to image/gif.
+    """
+    contents = []
+    for msg in window.get("contents", []):
+        attachments = [
+            {"url": a["url"], "content_type": "gif" if "gif" in (a.get("content_type") or "") else "image"}
+            for a in msg.get("attachments", [])
+        ]
+        base = {"username": msg["name"], "timestamp": msg["timestamp"]}
+        if msg.get("system"):
+            base["system"] = True
+        if msg.get("content") or not attachments:
+            contents.append({**base, "content": msg.get("content", ""), "attachments": []})
+        if attachments:
+            contents.append({**base, "content": "", "attachments": attachments[:1]})
+    return {
+        "descriptions": {"title": "벤치마크 채팅", "watermark": "@ho3_txle/tokkiyeah"},
+        "chatters": {name: {"avatarURL": chatter.get("avatar")} for name, chatter in window.get("chatters", {}).items()},
+        "contents": contents,
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, value, headers: dict = None):
+        self.send(200, json.dumps(value, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self):
+        standin = self.server.standin
+        url = urlparse(self.path)
+        standin.hit(url.path)
+
+        match = MESSAGES_ROUTE.match(url.path)
+        if match:
+            query = parse_qs(url.query)
+            page = standin.page(match.group(1), int(query.get("before", ["0"])[0]), int(query.get("limit", ["100"])[0]))
+            # a bucket that never runs out; multi_scrap.RateLimiter still parses every header
+            headers = {"X-RateLimit-Bucket": "standin", "X-RateLimit-Remaining": "49", "X-RateLimit-Reset-After": "0.0"}
+            return self.send_json(page, headers)
+
+        for pattern, content_type, make in ASSET_ROUTES:
+            if pattern.match(url.path):
+                return self.send(200, standin.asset(url.path, make), content_type, {"Cache-Control": "max-age=86400"})
+        self.send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        standin = self.server.standin
+        standin.hit(self.path)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if urlparse(self.path).path != COMPLETIONS_ROUTE:
+            return self.send(404, b"not found", "text/plain")
+        # generate_scenario sends str(window), a Python literal rather than JSON
+        window = ast.literal_eval(body["messages"][1]["content"])
+        self.send_json({
+            "id": "standin",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "standin"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(scenario_from_window(window), ensure_ascii=False)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+class StandIn:
+    """
+    Serves the routes above on 127.0.0.1 from a background thread.
+    `channels` maps channel_id -> raw Discord messages; `latency` seconds are added to every request.
+    """
+
+    def __init__(self, channels: dict = None, latency: float = 0.0, port: int = 0):
+        self.channels = {channel_id: sorted(messages, key=lambda msg: -int(msg["id"])) for channel_id, messages in (channels or {}).items()}
+        self.latency = latency
+        self.assets = {}
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = None
+
+    def hit(self, path: str):
+        with self._lock:
+            self.requests[path.split("/")[1] if "/" in path else path] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def page(self, channel_id: str, before: int, limit: int) -> list:
+        messages = self.channels.get(channel_id, [])
+        return [msg for msg in messages if int(msg["id"]) < before][:limit]
+
+    def asset(self, path: str, make) -> bytes:
+        with self._lock:
+            if path not in self.assets:
+                self.assets[path] = make(path)
+            return self.assets[path]
+
+    def env(self) -> dict:
+        """Environment that points scrap_discord, multi_scrap and generate_scenario at this stand-in."""
+        return {
+            "DISCORD_API": f"{self.url}/api/v9",
+            "DISCORD_CDN": self.url,
+            "OPENROUTER_BASE_URL": f"{self.url}/openrouter",
+            "OPENROUTERTOKEN": "standin",
+            "OPENROUTER_MODEL": "standin",
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
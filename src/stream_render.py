@@ -0,0 +1,188 @@
+"""
+Streaming render mode.
+
+Scenes are built one message at a time, their frames are piped as raw RGB into an ffmpeg
+subprocess and each scene is closed right after its last frame, so peak memory does not grow
+with the number of messages. Working set at 1080x1920, which MEMORY_CEILING_MB adds up:
+  - Python, numpy, PIL, moviepy and the pipeline modules: BASELINE_MB (~90MB measured)
+  - the active scene: COMPOSE_MB, moviepy's temporaries while composing its static layer (~190MB measured)
+    plus the layer, the compose buffer and one frame in the pipe (~20MB)
+  - decoded assets kept in-process by asset_cache: <= asset_cache.MAX_MEMORY_BYTES (256MB)
+  - the active gif's resized frames: <= animated_source.MAX_FRAME_CACHE_BYTES (64MB), whatever its length
+  - rendered text bitmaps: <= text_render.MAX_CACHE_BYTES (32MB)
+  - sound effects: SOUND_LIBRARY_MB for every file of asset/sounds decoded (~77MB), plus the sped-up
+    variants, <= sound_bank.MAX_FITTED_BYTES (64MB)
+render_streaming warns if the process peak exceeds the ceiling.
+"""
+from moviepy.config import FFMPEG_BINARY
+import math, os, subprocess, tempfile, time, wave
+import numpy as np
+import proglog
+import animated_source
+import asset_cache
+import encoder
+import prefetch
+import metrics
+import shorts
+import sound_bank
+import text_render
+import utils
+from compositor import FrameCompositor
+
+
+AUDIO_FPS = sound_bank.SAMPLE_RATE
+BASELINE_MB = 96
+COMPOSE_MB = 224
+SOUND_LIBRARY_MB = 80
+CACHES_MB = (
+    asset_cache.MAX_MEMORY_BYTES + animated_source.MAX_FRAME_CACHE_BYTES + text_render.MAX_CACHE_BYTES + sound_bank.MAX_FITTED_BYTES
+) // 1024**2
+MEMORY_CEILING_MB = BASELINE_MB + COMPOSE_MB + CACHES_MB + SOUND_LIBRARY_MB
+
+
+def plan_timeline(contents: list) -> tuple:
+    """Start of every message and the total duration."""
+    starts, total = [], 0.0
+    for msg in contents:
+        starts.append(total)
+        total += shorts.message_duration(msg)
+    return starts, total
+
+
+def first_frame(t: float, fps: int) -> int:
+    """Index of the first frame of the global frame grid at or after t."""
+    return math.ceil(round(t * fps, 6))
+
+
+def iter_frames(
+    scenario: dict, starts: list, total: float, message_font: str, overlays: list,
+    fps: int = shorts.FPS, first: int = 0, last: int = None, layout: shorts.Layout = shorts.FULL_LAYOUT,
+):
+    """
+    Yield the frames of messages [first, last) on the global frame grid (frame k is at t = k / fps).
+    Each scene is built when reached and closed once its frames are emitted.
+    """
+    contents = scenario.get("contents", [])
+    chatters = scenario.get("chatters", {})
+    last = len(contents) if last is None else last
+    compositor = FrameCompositor([], layout.size, shorts.BG_COLOR, overlays)
+    total_frames = int(total * fps)
+    for index in range(first, last):
+        scene = shorts.create_message_scene(contents[index], chatters, message_font, layout)
+        end = starts[index + 1] if index + 1 < len(starts) else total
+        try:
+            for k in range(first_frame(starts[index], fps), min(first_frame(end, fps), total_frames)):
+                # first_frame rounds, so k / fps may fall a hair before the start; a gif must not wrap to its last frame
+                yield compositor.render(index, scene, max(0.0, k / fps - starts[index]))
+        finally:
+            compositor.release()
+            scene.close()
+
+
+def write_audio_track(scenario: dict, starts: list, total: float, path: str, first: int = 0, last: int = None):
+    """Mix the sound effects of messages [first, last) scene by scene into a 16-bit stereo wav."""
+    contents = scenario.get("contents", [])
+    last = len(contents) if last is None else last
+    with metrics.tracer.span("audio"), wave.open(path, "wb") as wav:
+        wav.setnchannels(sound_bank.CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(AUDIO_FPS)
+        for index in range(first, last):
+            end = starts[index + 1] if index + 1 < len(starts) else total
+            n_samples = round(end * AUDIO_FPS) - round(starts[index] * AUDIO_FPS)
+            samples = np.zeros((n_samples, sound_bank.CHANNELS), dtype=np.float32)
+            sound = shorts.create_message_audio(contents[index], end - starts[index])
+            if sound is not None:
+                samples[: len(sound)] = sound[:n_samples]
+            wav.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def open_encoder(
+    output_path: str, fps: int, audio_path: str = None, profile: str = encoder.DEFAULT_PROFILE,
+    threads: int = 4, size: tuple = shorts.FULL_LAYOUT.size,
+) -> subprocess.Popen:
+    """ffmpeg process reading raw RGB frames of the given size from stdin and encoding them with a single pass of profile."""
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-vcodec", "rawvideo", "-s", f"{size[0]}x{size[1]}",
+        "-pix_fmt", "rgb24", "-r", str(fps), "-i", "-",
+    ]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a", *encoder.audio_args()]
+    else:
+        cmd += ["-an"]
+    cmd += [*encoder.video_args(profile, fps, threads), output_path]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+
+def pipe_frames(frames, output_path: str, fps: int, audio_path: str = None, profile: str = encoder.DEFAULT_PROFILE, size: tuple = shorts.FULL_LAYOUT.size, total: int = None) -> int:
+    """
+    Pipe frames into a single-pass ffmpeg (the lossless intermediate for two-pass profiles); returns the number of frames written.
+    Progress goes to the tracer's proglog logger as the frame_index bar (of total frames, if known), like moviepy's.
+    """
+    logger = proglog.default_bar_logger(metrics.tracer.logger)
+    if total:
+        logger(frame_index__total=total)
+    process = open_encoder(output_path, fps, audio_path, profile, size=size)
+    count, encode_seconds = 0, 0.0
+    try:
+        for frame in logger.iter_bar(frame_index=frames):
+            started = time.perf_counter()
+            process.stdin.write(np.ascontiguousarray(frame).data)
+            encode_seconds += time.perf_counter() - started
+            count += 1
+    finally:
+        # time spent writing into the pipe, i.e. waiting on ffmpeg
+        metrics.tracer.add("encode", encode_seconds, frames=count)
+        metrics.tracer.count("frames_encoded", count)
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    return count
+
+
+def encode_frames(frames, output_path: str, fps: int, audio_path: str = None, profile: str = encoder.DEFAULT_PROFILE, size: tuple = shorts.FULL_LAYOUT.size, total: int = None) -> int:
+    """Encode frames with profile, running both passes from a lossless intermediate for two-pass profiles."""
+    if not encoder.is_two_pass(profile):
+        return pipe_frames(frames, output_path, fps, audio_path, profile, size, total)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        intermediate_path = os.path.join(tmp_dir, "lossless.mp4")
+        count = pipe_frames(frames, intermediate_path, fps, profile=profile, size=size, total=total)
+        encoder.two_pass(intermediate_path, output_path, count / fps, fps, profile, audio_path)
+    return count
+
+
+@utils.debug_print
+def render_streaming(
+    scenario: dict,
+    title_font: str = shorts.DEFAULT_FONT,
+    message_font: str = shorts.DEFAULT_FONT,
+    watermark_font: str = shorts.DEFAULT_FONT,
+    filename: str = "output",
+    profile: str = encoder.DEFAULT_PROFILE,
+):
+    """Render a scenario with bounded memory: audio first, then frames streamed into ffmpeg."""
+    contents = scenario.get("contents", [])
+    if not contents:
+        print("No messages to generate.")
+        return
+
+    prefetch.prefetch_assets(scenario, shorts.AVATAR_SIZE, shorts.ATTACHMENT_SIZE)
+    starts, total = plan_timeline(contents)
+    overlays = shorts.create_overlays(scenario.get("descriptions", {}), title_font, watermark_font)
+
+    output_dir = "./output"
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{filename}.mp4")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        audio_path = os.path.join(tmp_dir, "audio.wav")
+        write_audio_track(scenario, starts, total, audio_path)
+        frames = iter_frames(scenario, starts, total, message_font, overlays)
+        count = encode_frames(frames, output_path, shorts.FPS, audio_path, profile, total=int(total * shorts.FPS))
+
+    asset_cache.default_cache.flush()
+    peak = metrics.peak_rss_mb()
+    print(f"✅ Video generated successfully: {output_path} ({count} frames, peak RSS {peak:.0f}MB)")
+    if peak > MEMORY_CEILING_MB:
+        print(f"⚠️ Warning: peak memory {peak:.0f}MB exceeded the {MEMORY_CEILING_MB}MB ceiling")
+    return output_path
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from moviepy import ImageClip
+import numpy as np
+import re, threading
+import metrics
+
+
+LINE_SPACING = 4  # px between lines, as moviepy's TextClip interline
+# Rendered bitmaps kept in memory. A message box is ~845KB of RGBA and message text is rarely repeated,
+# so this mostly holds usernames, titles and watermarks plus the last few dozen messages.
+MAX_CACHE_BYTES = 32 * 1024**2
+# Han, kana and fullwidth forms have no spaces between words and may break anywhere.
+# Hangul is written with spaces, so it wraps at spaces and only breaks inside a word that can't fit a line.
+TOKENS = re.compile(r"[⺀-⿟　-ヿ㐀-䶿一-鿿豈-﫿＀-￯]|[^\s⺀-⿟　-ヿ㐀-䶿一-鿿豈-﫿＀-￯]+|\s+")
+
+
+@lru_cache(maxsize=64)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a font once per (path, size)."""
+    return ImageFont.truetype(path, size)
+
+
+def split_long(token: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+    """Break a token that is wider than a line into line-sized pieces."""
+    pieces, current = [], ""
+    for char in token:
+        if current and font.getlength(current + char) > max_width:
+            pieces.append(current)
+            current = char
+        else:
+            current += char
+    return pieces + [current] if current else pieces
+
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+    """Greedy word wrap by measured width; never rasterizes."""
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for token in TOKENS.findall(paragraph):
+            candidate = line + token
+            if font.getlength(candidate) <= max_width:
+                line = candidate
+                continue
+            if token.isspace():
+                continue
+            if line.strip():
+                lines.append(line.rstrip())
+            if font.getlength(token) > max_width:
+                *full, token = split_long(token, font, max_width)
+                lines.extend(full)
+            line = token
+        lines.append(line.rstrip())
+    return lines
+
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+def render_text(text: str, font_path: str, font_size: int, color: str, box: tuple, align: str = "center", block_align: str = "center") -> np.ndarray:
+    """
+    Rasterize text wrapped to box = (width, height), vertically centered like TextClip's caption method:
+    the block of lines (as wide as its widest line) is placed in the box by block_align, and each line
+    within the block by align. Returns a read-only RGBA array, kept in an LRU bounded by MAX_CACHE_BYTES.
+    """
+    global _cache_bytes
+    key = (text, font_path, font_size, color, box, align, block_align)
+    with _cache_lock:
+        array = _cache.get(key)
+        if array is not None:
+            _cache.move_to_end(key)
+            return array
+    with metrics.tracer.span("text_layout", cat="text"):
+        array = _render_text(text, font_path, font_size, color, box, align, block_align)
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = array
+            _cache_bytes += array.nbytes
+        while len(_cache) > 1 and _cache_bytes > MAX_CACHE_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted.nbytes
+    return array
+
+
+def _render_text(text: str, font_path: str, font_size: int, color: str, box: tuple, align: str, block_align: str) -> np.ndarray:
+    metrics.tracer.count("text.rendered")
+    font = load_font(font_path, font_size)
+    width, height = box
+    lines = wrap_text(text, font, width)
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+    text_height = line_height * len(lines) + LINE_SPACING * (len(lines) - 1)
+
+    image = Image.new("RGBA", box, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    block_width = max(font.getlength(line) for line in lines)
+    if block_align == "center":
+        block_x = (width - block_width) / 2
+    elif block_align == "right":
+        block_x = width - block_width
+    else:
+        block_x = 0
+    y = (height - text_height) / 2
+    for line in lines:
+        line_width = font.getlength(line)
+        if align == "center":
+            x = block_x + (block_width - line_width) / 2
+        elif align == "right":
+            x = block_x + block_width - line_width
+        else:
+            x = block_x
+        draw.text((x, y), line, font=font, fill=color)
+        y += line_height + LINE_SPACING
+
+    array = np.array(image)
+    array.flags.writeable = False
+    return array
+
+
+def text_clip(text: str, font_path: str, font_size: int, color: str, box: tuple, align: str = "center", block_align: str = "center") -> ImageClip:
+    """Drop-in replacement for TextClip(method="caption") backed by the bitmap cache."""
+    metrics.tracer.count("text.requests")
+    return ImageClip(render_text(text, font_path, font_size, color, tuple(box), align, block_align))
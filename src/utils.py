@@ -1,6 +1,7 @@
 from typing import Callable
 from datetime import datetime
 import datetime as dt
+import metrics
 
 
 def debug_print(function: Callable):
@@ -8,7 +9,8 @@ def debug_print(function: Callable):
         before = datetime.now()
         print(f"\033[34mExecuting {function.__name__} function...\033[0m")
         try:
-            result = function(*args, **kwargs)
+            with metrics.tracer.span(function.__name__, cat="function"):
+                result = function(*args, **kwargs)
             after = datetime.now()
             print(f"\033[32mExecution of {function.__name__} was successful, took {(after-before).total_seconds()}s\033[0m")
             return result
@@ -0,0 +1,29 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# fonts, sounds and ./output are resolved relative to the repository root, as when running src/main.py
+os.chdir(ROOT)
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def standin_server():
+    """The local stand-in for Discord, OpenRouter and the CDNs (see src/standin.py)."""
+    import standin
+
+    with standin.StandIn() as server:
+        yield server
+
+
+@pytest.fixture
+def tmp_caches(tmp_path, monkeypatch):
+    """Empty asset, LLM, message and scene caches, so a test neither reads nor fills ./cache."""
+    import asset_cache, generate_scenario, message_store, scene_cache
+
+    monkeypatch.setattr(asset_cache, "default_cache", asset_cache.AssetCache(root=str(tmp_path / "assets")))
+    monkeypatch.setattr(generate_scenario, "CACHE_DIR", str(tmp_path / "llm"))
+    monkeypatch.setattr(message_store, "STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(scene_cache, "CACHE_DIR", str(tmp_path / "scenes"))
+    return tmp_path
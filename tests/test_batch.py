@@ -0,0 +1,40 @@
+import json
+import pytest
+import batch
+
+
+class StopWatching(Exception):
+    pass
+
+
+class FakeRunner:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job: dict):
+        self.jobs.append(job)
+
+    def poll(self, timeout: float = 1.0):
+        raise StopWatching
+
+
+def test_malformed_manifest_is_set_aside(tmp_path):
+    (tmp_path / "a.jsonl").write_text('{"channel_id": "1", "after": "x"\n', encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text("[1, 2]\n", encoding="utf-8")
+    (tmp_path / "c.jsonl").write_text(json.dumps({"scenario_src": "s.json"}) + "\n", encoding="utf-8")
+    runner = FakeRunner()
+    with pytest.raises(StopWatching):
+        batch.watch_spool(runner, str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.jsonl.failed", "b.jsonl.failed", "c.jsonl.queued"]
+    assert runner.jobs == [{"scenario_src": "s.json"}]
+
+
+def test_parallel_render_mode_falls_back_to_stream():
+    assert batch.job_config({"id": "j", "render_mode": "parallel"}, {})["render_mode"] == "stream"
+    assert batch.job_config({"id": "j", "render_mode": "cached"}, {})["render_mode"] == "cached"
+
+
+def test_load_from_file_is_set_for_every_job():
+    defaults = {"load_from_file": True, "scenario_src": "from_env.json"}
+    assert batch.job_config({"id": "a", "channel_id": "1", "after": "x", "before": "y"}, defaults)["load_from_file"] is False
+    assert batch.job_config({"id": "b", "scenario_src": "s.json"}, {"load_from_file": False})["load_from_file"] is True
@@ -0,0 +1,79 @@
+"""
+FrameCompositor against the CompositeVideoClip/concatenate_videoclips graph it replaced.
+
+  python tests/test_compositor.py    # prints the fps of both paths
+"""
+import time
+import numpy as np
+import pytest
+from moviepy import ColorClip, CompositeVideoClip, concatenate_videoclips
+
+
+def build(base_url: str):
+    """Text, image and gif scenes, with an extra title overlay laid over the gif."""
+    import shorts
+    from compositor import FrameCompositor
+
+    chatters = {"a": {"avatarURL": f"{base_url}/avatars/1/a.png"}, "b": {"avatarURL": f"{base_url}/avatars/2/b.png"}}
+    contents = [
+        {"username": "a", "content": "안녕 hello there, 오늘 점심 뭐 먹지", "attachments": []},
+        {"username": "b", "content": "", "attachments": [{"url": f"{base_url}/images/1.png", "content_type": "image"}]},
+        {"username": "a", "content": "", "attachments": [{"url": f"{base_url}/gifs/1.gif", "content_type": "gif"}]},
+    ]
+    scenes = [shorts.create_message_scene(msg, chatters) for msg in contents]
+    overlays = shorts.create_overlays({"title": "벤치마크 채팅", "watermark": "@ho3_txle/tokkiyeah"})
+    title_clip, title_x, _ = overlays[0]
+    overlays.append((title_clip, title_x, shorts.VIDEO_HEIGHT // 2))
+    size = (shorts.VIDEO_WIDTH, shorts.VIDEO_HEIGHT)
+    compositor = FrameCompositor(scenes, size, shorts.BG_COLOR, overlays)
+
+    # the graph shorts.py built before the compositor
+    message_clips = []
+    for scene in scenes:
+        layers = [clip.with_duration(scene.duration) for clip in scene.static_clips]
+        if scene.dynamic is not None:
+            clip, x, y = scene.dynamic
+            layers.append(clip.with_position((x, y)))
+        message_clips.append(CompositeVideoClip(layers, size=size).with_duration(scene.duration))
+    chat_sequence = concatenate_videoclips(message_clips, method="compose")
+    background = ColorClip(size=size, color=shorts.BG_COLOR).with_duration(chat_sequence.duration)
+    overlay_clips = [clip.with_duration(chat_sequence.duration).with_position((x, y)) for clip, x, y in overlays]
+    graph = CompositeVideoClip([background, chat_sequence] + overlay_clips)
+    return compositor, graph
+
+
+@pytest.fixture
+def paths(standin_server, tmp_caches):
+    return build(standin_server.url)
+
+
+def test_frames_are_pixel_identical(paths):
+    compositor, graph = paths
+    gif_start = compositor.starts[2]
+    assert compositor.scenes[2].dynamic is not None
+    times = [0.5, compositor.starts[1] + 0.5] + [gif_start + t for t in np.linspace(0, compositor.scenes[2].duration - 0.05, 8)]
+    for t in times:
+        expected = graph.get_frame(t)[:, :, :3].astype(np.uint8)
+        assert np.array_equal(compositor.frame(t), expected), f"frame at t={t:.2f} differs"
+
+
+def fps(render, times) -> float:
+    started = time.perf_counter()
+    for t in times:
+        render(t)
+    return len(times) / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    import conftest  # noqa: F401  (src on sys.path, repository root as cwd)
+    import tempfile
+    import asset_cache
+    import standin
+
+    asset_cache.default_cache = asset_cache.AssetCache(root=tempfile.mkdtemp(prefix="dc2s-compositor-"))
+    with standin.StandIn() as server:
+        compositor, graph = build(server.url)
+        gif_times = [compositor.starts[2] + j / 30 for j in range(int(compositor.scenes[2].duration * 30))]
+        all_times = [j / 30 for j in range(int(compositor.duration * 30))]
+        print(f"whole sequence  compositor {fps(compositor.frame, all_times):7.1f} fps   graph {fps(graph.get_frame, all_times[::5]):5.1f} fps")
+        print(f"gif scene       compositor {fps(compositor.frame, gif_times):7.1f} fps   graph {fps(graph.get_frame, gif_times[::5]):5.1f} fps")
@@ -0,0 +1,29 @@
+import asyncio, time
+import httpx
+import multi_scrap
+
+
+def test_global_token_bucket_caps_the_request_rate():
+    limiter = multi_scrap.RateLimiter(rate=200, burst=5)
+    granted = []
+
+    async def request(i: int):
+        await limiter.wait(f"GET /channels/{i % 40}/messages")
+        granted.append(time.monotonic())
+
+    async def run():
+        await asyncio.gather(*(request(i) for i in range(105)))
+
+    started = time.monotonic()
+    asyncio.run(run())
+    # the burst goes at once, the other 100 requests at 200/s
+    assert time.monotonic() - started >= 0.45
+    assert max(sum(1 for t in granted if start <= t < start + 0.1) for start in granted) <= 5 + 200 * 0.1 + 1
+
+
+def test_lock_survives_learning_the_bucket():
+    limiter = multi_scrap.RateLimiter()
+    route = "GET /channels/1/messages"
+    before = limiter.lock(route)
+    limiter.update(route, httpx.Response(200, headers={"X-RateLimit-Bucket": "abc", "X-RateLimit-Remaining": "4", "X-RateLimit-Reset-After": "1"}))
+    assert limiter.lock(route) is before
@@ -0,0 +1,19 @@
+import pytest
+import scenario_rules
+import standin
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("gif", standin.GIF_FRAMES * standin.GIF_FRAME_MS / 1000),
+    ("image", scenario_rules.IMAGE_DURATION),
+])
+def test_attachment_without_text_lasts_as_long_as_the_attachment(standin_server, tmp_caches, content_type, expected):
+    path = "gifs/1.gif" if content_type == "gif" else "images/1.png"
+    msg = {"username": "a", "content": "", "attachments": [{"url": f"{standin_server.url}/{path}", "content_type": content_type}]}
+    assert scenario_rules.assign_duration(msg) == pytest.approx(expected)
+    assert scenario_rules.assign_animation(msg) == "scaleFade"
+
+
+def test_text_durations_are_unchanged():
+    assert scenario_rules.assign_duration({"content": "", "attachments": []}) == 1.0
+    assert scenario_rules.assign_duration({"content": "x" * 60, "attachments": []}) == 3.1
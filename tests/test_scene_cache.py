@@ -0,0 +1,35 @@
+import os
+import metrics
+import scenario_rules
+import scene_cache
+
+
+def scenario(second: str) -> dict:
+    contents = [
+        {"username": "a", "content": "first message", "timestamp": "25. 8. 18. PM 9:00", "attachments": []},
+        {"username": "b", "content": second, "timestamp": "25. 8. 18. PM 9:01", "attachments": []},
+        {"username": "a", "content": "third message", "timestamp": "25. 8. 18. PM 9:02", "attachments": []},
+    ]
+    result = scenario_rules.apply_rules({"descriptions": {"title": "캐시 테스트"}, "chatters": {}, "contents": contents})
+    for msg in result["contents"]:
+        msg["duration"] = 0.3
+    return result
+
+
+def render(monkeypatch, scenario: dict) -> dict:
+    monkeypatch.setattr(metrics, "tracer", metrics.Tracer())
+    output_path = scene_cache.render_cached(scenario, filename="scene_cache_test", profile="preview")
+    os.remove(output_path)
+    return metrics.tracer.counters
+
+
+def test_rerender_reuses_unchanged_scenes(tmp_caches, monkeypatch):
+    counters = render(monkeypatch, scenario("second message"))
+    assert (counters["scene_cache.hit"], counters["scene_cache.miss"]) == (0, 3)
+    assert len(os.listdir(tmp_caches / "scenes")) == 3
+
+    counters = render(monkeypatch, scenario("second message"))
+    assert (counters["scene_cache.hit"], counters["scene_cache.miss"]) == (3, 0)
+
+    counters = render(monkeypatch, scenario("second message, edited"))
+    assert (counters["scene_cache.hit"], counters["scene_cache.miss"]) == (2, 1)
@@ -0,0 +1,101 @@
+"""
+End to end: `service.py --offline` in a scratch directory, one inline-scenario job and one scrape job
+of the bench-small channel, both rendered with the preview profile, followed through their event streams.
+"""
+import json, os, re, subprocess, sys, time
+import urllib.error, urllib.request
+import pytest
+import scenario_rules
+import shorts
+
+from conftest import ROOT
+
+
+STARTUP_TIMEOUT = 120
+JOB_TIMEOUT = 300
+SHUTDOWN_TIMEOUT = 10
+FONTS = {"title_font": shorts.DEFAULT_FONT, "message_font": shorts.DEFAULT_FONT, "watermark_font": shorts.DEFAULT_FONT}
+
+
+@pytest.fixture(scope="module")
+def service_url(tmp_path_factory):
+    # relative paths (./asset, ./cache, ./output) resolve in the scratch directory, with the assets linked in
+    workdir = tmp_path_factory.mktemp("service")
+    os.symlink(os.path.join(ROOT, "asset"), workdir / "asset")
+    log_path = workdir / "service.log"
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-u", os.path.join(ROOT, "src", "service.py"), "--offline", "--port", "0", "--workers", "1", "--results", "results.jsonl"],
+            cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not (match := re.search(r"Render service on (http://\S+)", log_path.read_text(encoding="utf-8"))):
+            assert process.poll() is None and time.monotonic() < deadline, log_path.read_text(encoding="utf-8")
+            time.sleep(0.2)
+        yield match.group(1)
+        children = subprocess.run(["ps", "-o", "pid=", "--ppid", str(process.pid)], capture_output=True, text=True).stdout.split()
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    # SIGTERM takes the workers down with the service: each one is gone or a zombie, once the
+    # resource tracker has noticed its parent is gone
+    assert children
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    while not all(state.startswith("Z") for state in process_states(children)):
+        assert time.monotonic() < deadline, f"service children still running: {process_states(children)}"
+        time.sleep(0.2)
+
+
+def process_states(pids: list) -> list:
+    return subprocess.run(["ps", "-o", "stat=", "-p", ",".join(pids)], capture_output=True, text=True).stdout.split()
+
+
+def post_job(url: str, body: dict) -> tuple:
+    request = urllib.request.Request(f"{url}/jobs", json.dumps(body).encode("utf-8"), {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def follow(url: str, job_id: str) -> list:
+    """Every state line of the job's event stream, up to the terminal one."""
+    with urllib.request.urlopen(f"{url}/jobs/{job_id}/events", timeout=JOB_TIMEOUT) as response:
+        return [json.loads(line) for line in response if line.strip()]
+
+
+def test_jobs_events_and_metrics(service_url):
+    scenario = scenario_rules.apply_rules({
+        "descriptions": {"title": "서비스 테스트", "watermark": "@ho3_txle/tokkiyeah"},
+        "chatters": {"채터0": {"avatarURL": None}},
+        "contents": [
+            {"username": "채터0", "content": "안녕하세요", "timestamp": "25. 8. 18. PM 9:00", "attachments": []},
+            {"username": "채터0", "content": "lol what is this", "timestamp": "25. 8. 18. PM 9:01", "attachments": []},
+        ],
+    })
+    status, inline = post_job(service_url, {"scenario": scenario, "render_mode": "preview", **FONTS})
+    assert status == 202 and inline["status"] == "queued"
+    status, scrape = post_job(service_url, {
+        "channel_id": "bench-small", "after": "2025_8_17_0_0", "before": "2025_8_19_23_59",
+        "render_mode": "preview", "priority": 1, **FONTS,
+    })
+    assert status == 202
+    status, error = post_job(service_url, {"scenario": scenario, "render_mode": "parallel"})
+    assert status == 400 and "parallel" in error["error"]
+
+    for job in (inline, scrape):
+        states = follow(service_url, job["id"])
+        assert states[-1]["status"] == "ok", states[-1]["error"]
+        assert [state["version"] for state in states] == sorted(set(state["version"] for state in states))
+        assert len(states[-1]["outputs"]) == 1
+        # the workers' proglog bars reach the job state
+        assert "frame_index" in states[-1]["progress"]
+
+    with urllib.request.urlopen(f"{service_url}/metrics") as response:
+        metrics = json.load(response)
+    assert metrics["queue_depth"] == 0 and metrics["running"] == 0
+    assert metrics["outcomes"] == {"ok": 2}
+    assert metrics["run_seconds"]["count"] == 2
+    assert metrics["counters"]["service.submitted"] == 2
@@ -0,0 +1,20 @@
+import numpy as np
+import sound_bank
+
+
+def test_fitted_variants_are_bounded_by_bytes():
+    bank = sound_bank.SoundBank(max_fitted_bytes=2 * 1024**2)
+    bank._sounds["siren.mp3"] = (np.full((sound_bank.SAMPLE_RATE * 4, sound_bank.CHANNELS), 0.5, np.float32), 0.5)
+    for duration in np.linspace(0.5, 3.5, 60):
+        fitted = bank.fitted("siren.mp3", duration)
+        assert len(fitted) == round(duration * sound_bank.SAMPLE_RATE)
+    assert bank._fitted_bytes <= 2 * 1024**2
+    assert bank._fitted_bytes == sum(samples.nbytes for samples in bank._fitted.values())
+
+
+def test_short_sounds_are_not_copied():
+    bank = sound_bank.SoundBank()
+    samples = np.zeros((100, sound_bank.CHANNELS), np.float32)
+    bank._sounds["ack.mp3"] = (samples, 0.0)
+    assert bank.fitted("ack.mp3", 1.0) is samples
+    assert not bank._fitted
@@ -0,0 +1,53 @@
+"""
+Peak memory of streaming renders: flat in the number of messages, and under stream_render.MEMORY_CEILING_MB.
+
+Every case renders in a fresh spawned process (benchmark.run_suite), so its peak RSS is its own.
+The 500-message render takes ~18 minutes on one core, so it only runs with RUN_SLOW=1:
+
+  RUN_SLOW=1 python -m pytest -q tests/test_stream_memory.py -s
+
+Recorded 2026-10-18 on one core: 572 scenes, 37265 frames, peak RSS 690MB of the 816MB ceiling, in 18 minutes.
+"""
+import os
+import pytest
+
+
+N = 40  # enough messages to fill the text bitmap cache, so both runs compare steady states
+FLAT_TOLERANCE = 0.10  # peak RSS of 5N messages may exceed that of N by this share
+# Short scenes, so 5N messages render in seconds (gifs keep their own length). Every gif and image
+# message shares one url, so the asset cache holds the same in both runs and only per-scene growth
+# shows; the caches' own bounds are part of MEMORY_CEILING_MB.
+FLAT_CASE = {"text_length": 40, "image_share": 0.15, "gif_share": 0.05, "chatters": 8, "duration": 0.1, "attachment_pool": 1}
+CEILING_CASE = {"messages": 500, "text_length": 40, "image_share": 0.15, "gif_share": 0.1, "chatters": 8}
+
+
+@pytest.fixture
+def fonts(monkeypatch):
+    import shorts
+
+    for font in ("title_font", "message_font", "watermark_font"):
+        monkeypatch.setenv(font, shorts.DEFAULT_FONT)
+
+
+def test_peak_memory_is_flat_in_message_count(fonts):
+    import benchmark
+    import stream_render
+
+    cases = {"n": {**FLAT_CASE, "messages": N}, "5n": {**FLAT_CASE, "messages": 5 * N}}
+    small, large = benchmark.run_suite(cases, ["render"], "stream", ["preview"], repeat=1)
+    print(f"\n{small['messages']} scenes: peak RSS {small['peak_rss_mb']:.0f}MB, {large['messages']} scenes: {large['peak_rss_mb']:.0f}MB")
+    assert large["messages"] >= 5 * N
+    assert large["peak_rss_mb"] <= small["peak_rss_mb"] * (1 + FLAT_TOLERANCE)
+    assert large["peak_rss_mb"] < stream_render.MEMORY_CEILING_MB
+
+
+@pytest.mark.skipif(not os.getenv("RUN_SLOW"), reason="renders 500 messages; set RUN_SLOW=1")
+def test_500_messages_stay_under_the_ceiling(fonts):
+    import benchmark
+    import stream_render
+
+    # preview keeps the encode short
+    (result,) = benchmark.run_suite({"ceiling": CEILING_CASE}, ["render"], "stream", ["preview"], repeat=1)
+    print(f"\n{result['messages']} scenes, {result['frames']} frames, peak RSS {result['peak_rss_mb']:.0f}MB")
+    assert result["messages"] >= CEILING_CASE["messages"]
+    assert result["peak_rss_mb"] < stream_render.MEMORY_CEILING_MB
@@ -0,0 +1,24 @@
+import itertools
+import numpy as np
+import shorts
+import stream_render
+from compositor import FrameCompositor
+
+
+def test_gif_scene_starts_on_its_first_frame(standin_server, tmp_caches):
+    # 0.1 + 0.2 == 0.30000000000000004: frame 9 (t = 0.3) is the gif scene's first, a hair before its start
+    contents = [
+        {"username": "a", "content": "first", "attachments": [], "duration": 0.1},
+        {"username": "a", "content": "second", "attachments": [], "duration": 0.2},
+        {"username": "a", "content": "", "attachments": [{"url": f"{standin_server.url}/gifs/1.gif", "content_type": "gif"}]},
+    ]
+    starts, total = stream_render.plan_timeline(contents)
+    assert stream_render.first_frame(starts[2], shorts.FPS) / shorts.FPS < starts[2]
+
+    frames = stream_render.iter_frames({"contents": contents, "chatters": {}}, starts, total, shorts.DEFAULT_FONT, [])
+    frame = next(itertools.islice(frames, 9, None)).copy()
+    frames.close()
+    scene = shorts.create_message_scene(contents[2], {})
+    expected = FrameCompositor([scene], shorts.FULL_LAYOUT.size, shorts.BG_COLOR).frame(0.0)
+    assert np.array_equal(frame, expected)
+    scene.close()
@@ -0,0 +1,33 @@
+import datetime as dt
+import scenario_rules
+import standin
+from chat_data import ChatRawData
+from scrap_discord import build_chat_data, message_to_content
+
+
+def raw(i: int, content: str, bot: bool = False, type: int = 0) -> dict:
+    author = {"id": str(i), "username": f"user{i}", "global_name": None, "avatar": "0" * 32}
+    if bot:
+        author["bot"] = True
+    return {
+        "author": author,
+        "content": content,
+        "timestamp": (dt.datetime(2025, 8, 18, tzinfo=dt.timezone.utc) + dt.timedelta(seconds=i)).isoformat(),
+        "attachments": [],
+        "type": type,
+    }
+
+
+def test_bot_and_generated_messages_get_system_rules(tmp_path):
+    messages = [raw(1, "hello there"), raw(2, "[Rank] user1 reached level 2", bot=True), raw(3, "", type=7), raw(4, "reply", type=19)]
+    chat = build_chat_data(message_to_content(msg, dt.timezone.utc) for msg in messages)
+    assert [msg.get("system", False) for msg in chat.iter_messages()] == [False, True, True, False]
+
+    path = str(tmp_path / "chat.ndjson")
+    chat.write_ndjson(path)
+    assert ChatRawData.read_ndjson(path).contents == chat.contents
+
+    scenario = scenario_rules.apply_rules(standin.scenario_from_window(chat.get_data()))
+    rules = [(msg["animation"], msg["duration"]) for msg in scenario["contents"]]
+    assert rules[1] == rules[2] == ("none", 1.0)
+    assert rules[0][0] == rules[3][0] == "pop"
@@ -0,0 +1,40 @@
+import numpy as np
+import shorts
+import text_render
+
+
+BOX = (880, 140)
+
+
+def ink_columns(array: np.ndarray) -> tuple:
+    columns = np.flatnonzero(array[:, :, 3].any(axis=0))
+    return columns[0], columns[-1]
+
+
+def test_single_line_overlay_is_centered():
+    left = text_render.render_text("벤치마크 채팅", shorts.DEFAULT_FONT, 70, "white", BOX, align="left")
+    center = text_render.render_text("벤치마크 채팅", shorts.DEFAULT_FONT, 70, "white", BOX, align="center")
+    assert np.array_equal(left, center)
+    first, last = ink_columns(left)
+    assert abs((first + last) / 2 - BOX[0] / 2) <= 2
+
+
+def test_left_aligned_lines_share_a_centered_block():
+    text = "a much longer first line of the title\nshort"
+    array = text_render.render_text(text, shorts.DEFAULT_FONT, 40, "white", BOX, align="left")
+    font = text_render.load_font(shorts.DEFAULT_FONT, 40)
+    block_x = (BOX[0] - max(font.getlength(line) for line in text_render.wrap_text(text, font, BOX[0]))) / 2
+    lines = np.flatnonzero(array[:, :, 3].any(axis=1))
+    second_line = array[lines[-1] - 5 : lines[-1] + 1]
+    # both lines start at the block's left edge, which is not the box's
+    assert block_x > 20
+    assert abs(ink_columns(array)[0] - block_x) <= 4
+    assert abs(ink_columns(second_line)[0] - block_x) <= 4
+
+
+def test_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(text_render, "MAX_CACHE_BYTES", 4 * 880 * 240 * 4)
+    for i in range(20):
+        text_render.render_text(f"message {i}", shorts.DEFAULT_FONT, 60, "white", (880, 240))
+    assert text_render._cache_bytes <= text_render.MAX_CACHE_BYTES
+    assert len(text_render._cache) <= 4